@@ -0,0 +1,133 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+LIST_GENERATION_KEY = 'response_cache:generation:list'
+RECIPE_GENERATION_KEY = 'response_cache:generation:recipe:{}'
+HITS_KEY = 'response_cache:hits'
+MISSES_KEY = 'response_cache:misses'
+
+
+def get_cache():
+    return caches[settings.RESPONSE_CACHE_ALIAS]
+
+
+def invalidate_recipes(recipe_ids):
+    """
+    Сбрасывает кэш страниц рецептов recipe_ids и всех страниц списка.
+    Поколение - время сброса, оно же служит Last-Modified ответа.
+    Ключ поколения живёт дольше любого ответа, закэшированного
+    до сброса: когда он истечёт, старых ответов в кэше уже нет.
+    """
+    recipe_ids = list(recipe_ids)
+    if not recipe_ids:
+        return
+    now = time.time()
+    keys = [LIST_GENERATION_KEY] + [
+        RECIPE_GENERATION_KEY.format(pk) for pk in recipe_ids]
+    get_cache().set_many(dict.fromkeys(keys, now),
+                         timeout=2 * settings.RESPONSE_CACHE_TIMEOUT)
+
+
+def get_generation(key):
+    """
+    Поколение или None, если сбросов ещё не было. При чтении ключ
+    не создаётся: иначе запросы к несуществующим id засоряли бы кэш.
+    """
+    return get_cache().get(key)
+
+
+def count(key):
+    cache = get_cache()
+    cache.add(key, 0, timeout=None)
+    try:
+        cache.incr(key)
+    except ValueError:
+        pass
+
+
+def get_stats():
+    stats = get_cache().get_many([HITS_KEY, MISSES_KEY])
+    return {'hits': stats.get(HITS_KEY, 0),
+            'misses': stats.get(MISSES_KEY, 0)}
+
+
+class AnonymousResponseCacheMixin:
+    """
+    Кэширует ответы list и retrieve для анонимных пользователей.
+    Ключ - путь с параметрами запроса, формат ответа и поколение,
+    которое сбрасывается сигналами при изменении данных.
+    Счётчики рецептов и авторов меняются через update() без сброса
+    поколения и в кэшированном ответе отстают не больше чем
+    на RESPONSE_CACHE_TIMEOUT.
+    """
+    cached_actions = ('list', 'retrieve')
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.response_cache_key = None
+        if (self.action not in self.cached_actions
+                or request.method != 'GET'
+                or request.user.is_authenticated):
+            return
+        if self.action == 'retrieve':
+            generation_key = RECIPE_GENERATION_KEY.format(
+                kwargs[self.lookup_url_kwarg or self.lookup_field])
+        else:
+            generation_key = LIST_GENERATION_KEY
+        self.response_generation = get_generation(generation_key)
+        path_hash = hashlib.md5(
+            request.get_full_path().encode()).hexdigest()
+        self.response_cache_key = (
+            f'response_cache:{request.accepted_renderer.format}:'
+            f'{self.response_generation or 0}:{path_hash}')
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(request) or super().list(
+            request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(request) or super().retrieve(
+            request, *args, **kwargs)
+
+    def get_cached_response(self, request):
+        if self.response_cache_key is None:
+            return None
+        cached = get_cache().get(self.response_cache_key)
+        if cached is None:
+            count(MISSES_KEY)
+            return None
+        count(HITS_KEY)
+        content, content_type, etag = cached
+        response = HttpResponse(content, content_type=content_type)
+        return self.set_validators(request, response, etag)
+
+    def set_validators(self, request, response, etag):
+        response['ETag'] = etag
+        last_modified = None
+        if self.response_generation is not None:
+            last_modified = int(self.response_generation)
+            response['Last-Modified'] = http_date(last_modified)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+            response=response)
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        response = super().finalize_response(
+            request, response, *args, **kwargs)
+        if (getattr(self, 'response_cache_key', None) is None
+                or response.status_code != 200
+                or response.has_header('ETag')):
+            return response
+        response.render()
+        etag = quote_etag(hashlib.md5(response.content).hexdigest())
+        get_cache().set(
+            self.response_cache_key,
+            (response.content, response['Content-Type'], etag),
+            settings.RESPONSE_CACHE_TIMEOUT)
+        return self.set_validators(request, response, etag)
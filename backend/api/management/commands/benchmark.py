@@ -0,0 +1,219 @@
+import io
+import json
+import random
+import statistics
+import time
+
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import (CaptureQueriesContext, setup_databases,
+                               setup_test_environment,
+                               teardown_databases, teardown_test_environment)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from ingredients.models import Ingredient
+from interactions.models import Favorite, FeedEntry, ShoppingCart
+from recipes.models import Recipe, RecipeIngredients
+from users.models import Subscription, User
+
+ENDPOINTS = {
+    'recipes': '/api/recipes/',
+    'subscriptions': '/api/users/subscriptions/?recipes_limit=3',
+    'ingredients': '/api/ingredients/?search={prefix}',
+    'search': '/api/recipes/?search={word}',
+    'feed': '/api/recipes/feed/',
+    'download_shopping_cart': '/api/recipes/download_shopping_cart/',
+}
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+class Command(BaseCommand):
+    help = ('Seed a throwaway test database and measure latency, throughput '
+            'and queries per request of the API hot paths')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--recipes', type=int, default=500)
+        parser.add_argument('--ingredients', type=int, default=2000,
+                            help='Size of the ingredient catalogue')
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--favorites', type=int, default=20,
+                            help='Favorites per user')
+        parser.add_argument('--cart', type=int, default=10,
+                            help='Recipes in the shopping cart per user')
+        parser.add_argument('--subscriptions', type=int, default=10,
+                            help='Subscriptions per user')
+        parser.add_argument('--feed-subscriptions', type=int,
+                            help='Subscriptions of the measured user, '
+                                 '--subscriptions by default')
+        parser.add_argument('--requests', type=int, default=50,
+                            help='Requests per endpoint')
+        parser.add_argument('--endpoint', action='append',
+                            choices=ENDPOINTS, dest='endpoints',
+                            help='Endpoint to measure, all by default')
+        parser.add_argument('--page-size', type=int, default=6)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Write JSON results to a file')
+        parser.add_argument('--keepdb', action='store_true',
+                            help='Keep the test database between runs')
+
+    def handle(self, *args, **options):
+        random.seed(options['seed'])
+        setup_test_environment(debug=False)
+        old_config = setup_databases(
+            verbosity=0, interactive=False, keepdb=options['keepdb'])
+        try:
+            started = time.monotonic()
+            user = self.seed(options)
+            seed_time = time.monotonic() - started
+            results = {
+                'database': connection.vendor,
+                'dataset': {key: options[key] for key in (
+                    'users', 'recipes', 'ingredients',
+                    'ingredients_per_recipe', 'favorites', 'cart',
+                    'subscriptions', 'feed_subscriptions')},
+                'seed_seconds': round(seed_time, 3),
+                'endpoints': {
+                    name: self.measure(user, name, options)
+                    for name in options['endpoints'] or ENDPOINTS},
+                'feed_queries': self.compare_feed(user, options),
+            }
+        finally:
+            teardown_databases(old_config, verbosity=0,
+                               keepdb=options['keepdb'])
+            teardown_test_environment()
+
+        output = json.dumps(results, indent=2, ensure_ascii=False)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output)
+        self.stdout.write(output)
+
+    def seed(self, options):
+        if User.objects.filter(username='bench0').exists():
+            return User.objects.get(username='bench0')
+        Ingredient.objects.bulk_create(
+            Ingredient(name=f'ингредиент {i:05d}', measurement_unit='г')
+            for i in range(options['ingredients']))
+        ingredient_ids = list(Ingredient.objects.values_list('id', flat=True))
+        User.objects.bulk_create(
+            User(email=f'bench{i}@example.com', username=f'bench{i}',
+                 first_name='Bench', last_name=str(i), password='!')
+            for i in range(options['users']))
+        user_ids = list(User.objects.values_list('id', flat=True))
+        Recipe.objects.bulk_create(
+            (Recipe(author_id=random.choice(user_ids), name=f'Рецепт {i}',
+                    text='Описание ' * 20, cooking_time=random.randint(1, 180),
+                    image='recipes/images/benchmark.png')
+             for i in range(options['recipes'])),
+            batch_size=1000)
+        recipe_ids = list(Recipe.objects.values_list('id', flat=True))
+        RecipeIngredients.objects.bulk_create(
+            (RecipeIngredients(recipe_id=recipe_id, ingredient_id=pk,
+                               amount=random.randint(1, 500))
+             for recipe_id in recipe_ids
+             for pk in random.sample(
+                ingredient_ids, options['ingredients_per_recipe'])),
+            batch_size=1000)
+        for model, field, targets, per_user in (
+                (Favorite, 'recipe_id', recipe_ids, options['favorites']),
+                (ShoppingCart, 'recipe_id', recipe_ids, options['cart']),
+                (Subscription, 'author_id', user_ids,
+                 options['subscriptions'])):
+            model.objects.bulk_create(
+                (model(user_id=user_id, **{field: target})
+                 for user_id in user_ids
+                 for target in random.sample(
+                    targets, min(per_user, len(targets)))
+                 if target != user_id or model is not Subscription),
+                batch_size=1000, ignore_conflicts=True)
+        if options['feed_subscriptions']:
+            user = User.objects.get(username='bench0')
+            Subscription.objects.bulk_create(
+                (Subscription(user=user, author_id=author_id)
+                 for author_id in user_ids[:options['feed_subscriptions'] + 1]
+                 if author_id != user.pk),
+                batch_size=1000, ignore_conflicts=True)
+        call_command('recount_recipe_counters', stdout=io.StringIO())
+        call_command('recount_user_stats', stdout=io.StringIO())
+        call_command('rebuild_feeds', stdout=io.StringIO())
+        call_command('rebuild_shopping_lists', stdout=io.StringIO())
+        call_command('rebuild_search_index', stdout=io.StringIO())
+        return User.objects.get(username='bench0')
+
+    def compare_feed(self, user, options):
+        """
+        Первые страницы ленты: таблица FeedEntry против соединения
+        рецептов с подписками, сортированного по дате публикации.
+        """
+        limit = options['page_size']
+        authors = Subscription.objects.filter(user=user).values('author')
+
+        def naive():
+            return list(Recipe.objects.filter(author__in=authors).order_by(
+                '-pub_date', '-id').values_list('pub_date', 'id')[:limit])
+
+        def timeline():
+            return FeedEntry.timeline(user, None, limit)
+
+        if naive() != timeline():
+            raise CommandError('Feed timeline differs from the naive join')
+        return {
+            'subscriptions': authors.count(),
+            'timeline': self.timed(timeline, options['requests']),
+            'naive_join': self.timed(naive, options['requests']),
+        }
+
+    def timed(self, call, requests):
+        latencies, queries = [], []
+        for _ in range(requests):
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as context:
+                call()
+            latencies.append(time.perf_counter() - started)
+            queries.append(len(context.captured_queries))
+        return self.summary(latencies, queries)
+
+    def measure(self, user, name, options):
+        client = APIClient()
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+        url = ENDPOINTS[name]
+        latencies, queries = [], []
+        for i in range(options['requests']):
+            path = url.format(prefix=f'ингредиент {i % 10}',
+                              word=f'{i % options["ingredients"]:05d}')
+            if name == 'recipes':
+                offset = i * options['page_size'] % max(options['recipes'], 1)
+                path += f'?limit={options["page_size"]}&offset={offset}'
+            elif name == 'search':
+                path += f'&limit={options["page_size"]}'
+            started = time.perf_counter()
+            with CaptureQueriesContext(connection) as context:
+                response = client.get(path)
+                if response.streaming:
+                    b''.join(response.streaming_content)
+            latencies.append(time.perf_counter() - started)
+            queries.append(len(context.captured_queries))
+            if response.status_code != 200:
+                raise CommandError(
+                    f'{path} returned {response.status_code}')
+        return self.summary(latencies, queries)
+
+    def summary(self, latencies, queries):
+        latencies.sort()
+        return {
+            'requests': len(latencies),
+            'p50_ms': round(percentile(latencies, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(latencies, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(latencies, 0.99) * 1000, 2),
+            'mean_ms': round(statistics.mean(latencies) * 1000, 2),
+            'throughput_rps': round(len(latencies) / sum(latencies), 1),
+            'queries_per_request': round(statistics.mean(queries), 2),
+            'max_queries': max(queries),
+        }
@@ -1,28 +1,51 @@
+from django.db import transaction
 from rest_framework import serializers
 from djoser.serializers import UserSerializer, UserCreateSerializer
 
 from utils.base64imagefield import MyBase64ImageField
+from utils.images import thumbnail_srcset
+from utils.sparse_fields import SparseFieldsMixin
 from ingredients.models import Ingredient
-from interactions.models import Favorite, ShoppingCart
+from interactions.cache import UserInteractions
+from interactions.models import Favorite, ShoppingCart, ShoppingListItem
 from recipes.models import Recipe, RecipeIngredients
 from users.models import User, Subscription
 
 
-class MyUserSerializer(UserSerializer):
+class ImageSrcsetField(serializers.ReadOnlyField):
+    """
+    Созданные миниатюры изображения в формате атрибута srcset.
+    None, пока миниатюр нет: клиент показывает оригинал из image.
+    """
+
+    def to_representation(self, value):
+        request = self.context.get('request')
+        urls = []
+        for url, width in thumbnail_srcset(value):
+            if request:
+                url = request.build_absolute_uri(url)
+            urls.append(f'{url} {width}w')
+        return ', '.join(urls) or None
+
+
+class MyUserSerializer(SparseFieldsMixin, UserSerializer):
     """Сериализатор пользователя"""
     avatar = MyBase64ImageField(required=False)
+    avatar_srcset = ImageSrcsetField(source='avatar')
     is_subscribed = serializers.SerializerMethodField()
 
     class Meta:
         model = User
         fields = ('email', 'id', 'username', 'first_name',
-                  'last_name', 'avatar', 'is_subscribed')
+                  'last_name', 'avatar', 'avatar_srcset', 'is_subscribed',
+                  'recipes_count', 'followers_count', 'following_count',
+                  'favorites_received')
 
     def get_is_subscribed(self, obj):
-        user = self.context['request'].user
-        if not user or not user.is_authenticated:
-            return False
-        return obj.is_subscribed(user)
+        if hasattr(obj, 'subscribed'):
+            return obj.subscribed
+        return UserInteractions.for_request(
+            self.context['request']).has(Subscription, obj.id)
 
 
 class MyUserCreateSerializer(UserCreateSerializer):
@@ -61,13 +84,14 @@ class AvatarResponseSerializer(serializers.ModelSerializer):
 class UserWithRecipesSerializer(MyUserSerializer):
     """Сериализатор пользователя с рецептами"""
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
 
     class Meta(MyUserSerializer.Meta):
-        fields = ('email', 'id', 'username', 'first_name', 'last_name',
-                  'avatar', 'is_subscribed', 'recipes', 'recipes_count')
+        fields = MyUserSerializer.Meta.fields + ('recipes',)
 
     def get_recipes(self, obj):
+        if hasattr(obj, 'limited_recipes'):
+            return RecipeMinifiedSerializer(obj.limited_recipes, many=True,
+                                            context=self.context).data
         limit = self.context['request'].query_params.get('recipes_limit')
         recipes = obj.recipes.all()
         if limit:
@@ -79,9 +103,6 @@ class UserWithRecipesSerializer(MyUserSerializer):
         return RecipeMinifiedSerializer(recipes, many=True,
                                         context=self.context).data
 
-    def get_recipes_count(self, obj):
-        return obj.recipes.count()
-
 
 class SubscriptionSerializer(serializers.ModelSerializer):
     """Сериализатор подписок"""
@@ -117,10 +138,10 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit')
 
 
-class RecipeIngredientsSerializer(serializers.ModelSerializer):
+class RecipeIngredientsSerializer(SparseFieldsMixin,
+                                  serializers.ModelSerializer):
     """Сериализатор количества ингредиентов"""
-    id = serializers.PrimaryKeyRelatedField(
-        queryset=Ingredient.objects.all(), source='ingredient.id')
+    id = serializers.IntegerField(source='ingredient.id')
     name = serializers.ReadOnlyField(source='ingredient.name')
     measurement_unit = serializers.ReadOnlyField(
         source='ingredient.measurement_unit')
@@ -131,29 +152,41 @@ class RecipeIngredientsSerializer(serializers.ModelSerializer):
         fields = ('id', 'name', 'measurement_unit', 'amount')
 
 
-class RecipeSerializer(serializers.ModelSerializer):
+class RecipeSerializer(SparseFieldsMixin, serializers.ModelSerializer):
     """Основной сериализатор рецептов"""
+    expandable_fields = ('author',)
+
     author = MyUserSerializer(read_only=True)
     ingredients = RecipeIngredientsSerializer(
         source='recipe_ingredients', many=True)
     image = MyBase64ImageField()
+    image_srcset = ImageSrcsetField(source='image')
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'author', 'ingredients', 'image', 'text',
-                  'cooking_time', 'is_favorited', 'is_in_shopping_cart')
+        fields = ('id', 'name', 'author', 'ingredients', 'image',
+                  'image_srcset', 'text', 'cooking_time', 'is_favorited',
+                  'is_in_shopping_cart')
+
+    def to_representation(self, instance):
+        if (hasattr(instance, 'author_subscribed')
+                and 'author' in self.fields):
+            instance.author.subscribed = instance.author_subscribed
+        return super().to_representation(instance)
 
     def get_is_favorited(self, obj):
-        user = self.context.get('request').user
-        return (user.is_authenticated and Favorite.objects.filter(
-            user=user, recipe=obj).exists())
+        if hasattr(obj, 'is_favorited'):
+            return obj.is_favorited
+        return UserInteractions.for_request(
+            self.context['request']).has(Favorite, obj.id)
 
     def get_is_in_shopping_cart(self, obj):
-        user = self.context.get('request').user
-        return (user.is_authenticated and ShoppingCart.objects.filter(
-            user=user, recipe=obj).exists())
+        if hasattr(obj, 'is_in_shopping_cart'):
+            return obj.is_in_shopping_cart
+        return UserInteractions.for_request(
+            self.context['request']).has(ShoppingCart, obj.id)
 
 
 class RecipeCreateUpdateSerializer(RecipeSerializer):
@@ -168,6 +201,13 @@ class RecipeCreateUpdateSerializer(RecipeSerializer):
         if len(ingredient_ids) != len(set(ingredient_ids)):
             raise serializers.ValidationError(
                 'Ингредиенты не должны повторяться.')
+        ingredients = Ingredient.objects.in_bulk(ingredient_ids)
+        missing = [pk for pk in ingredient_ids if pk not in ingredients]
+        if missing:
+            raise serializers.ValidationError(
+                f'Ингредиенты с id {missing} не существуют.')
+        for item in value:
+            item['ingredient']['id'] = ingredients[item['ingredient']['id']]
         return value
 
     def create_ingredients(self, recipe, ingredients_data):
@@ -179,29 +219,65 @@ class RecipeCreateUpdateSerializer(RecipeSerializer):
         ]
         RecipeIngredients.objects.bulk_create(ingredient_amounts)
 
+    @transaction.atomic
     def create(self, validated_data):
         ingredients = validated_data.pop("recipe_ingredients")
         recipe = Recipe.objects.create(**validated_data)
         self.create_ingredients(recipe, ingredients)
         return recipe
 
+    @transaction.atomic
     def update(self, instance, validated_data):
         ingredients_data = validated_data.pop('recipe_ingredients', None)
         if ingredients_data is None:
             raise serializers.ValidationError(
                 {'ingredients': 'Это поле обязательно для заполнения.'})
-        instance.ingredients.clear()
-        self.create_ingredients(instance, ingredients_data)
+        self.update_ingredients(instance, ingredients_data)
         return super().update(instance, validated_data)
 
+    def update_ingredients(self, recipe, ingredients_data):
+        """
+        Приводит ингредиенты рецепта к ingredients_data, изменяя
+        только отличающиеся строки, и обновляет списки покупок.
+        """
+        list(Recipe.objects.select_for_update().filter(
+            pk=recipe.pk).values_list('pk', flat=True))
+        current = {item.ingredient_id: item
+                   for item in recipe.recipe_ingredients.all()}
+        amounts = {item['ingredient']['id'].pk: item['amount']
+                   for item in ingredients_data}
+
+        # bulk_update и bulk_create не отправляют сигналов, поэтому
+        # их изменения вносятся в списки покупок здесь; удаление строк
+        # учитывают обработчики post_delete.
+        deltas = {pk: amount - (current[pk].amount if pk in current else 0)
+                  for pk, amount in amounts.items()}
+        ShoppingListItem.apply_delta(
+            ShoppingListItem.cart_users(recipe.pk), deltas)
+
+        changed = []
+        for pk, item in current.items():
+            if pk in amounts and item.amount != amounts[pk]:
+                item.amount = amounts[pk]
+                changed.append(item)
+        RecipeIngredients.objects.bulk_update(changed, ['amount'])
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe, ingredient_id=pk, amount=amount)
+            for pk, amount in amounts.items() if pk not in current)
+        removed = current.keys() - amounts.keys()
+        if removed:
+            RecipeIngredients.objects.filter(
+                recipe=recipe, ingredient_id__in=removed).delete()
+
 
 class RecipeMinifiedSerializer(serializers.ModelSerializer):
     """Минимизированный сериализатор рецепта (для избранного и корзины)."""
     image = serializers.SerializerMethodField()
+    image_srcset = ImageSrcsetField(source='image')
 
     class Meta:
         model = Recipe
-        fields = ('id', 'name', 'image', 'cooking_time')
+        fields = ('id', 'name', 'image', 'image_srcset', 'cooking_time')
 
     def get_image(self, obj):
         request = self.context.get('request')
@@ -245,11 +321,20 @@ class ShoppingCartSerializer(BaseInteractionSerializer):
         fields = ('id', 'user', 'recipe')
 
 
+class RecipeIdsSerializer(serializers.Serializer):
+    """Сериализатор списка id рецептов для пакетных операций."""
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False, max_length=100)
+
+    def validate_recipes(self, value):
+        return list(dict.fromkeys(value))
+
+
 class ShoppingCartDownloadSerializer(serializers.Serializer):
-    """Сериализатор скачивания списка покупок"""
-    name = serializers.CharField(source='ingredient.name')
-    measurement_unit = serializers.CharField(
-        source='ingredient.measurement_unit')
+    """Сериализатор строки скачиваемого списка покупок"""
+    name = serializers.CharField()
+    measurement_unit = serializers.CharField()
     total_amount = serializers.IntegerField()
 
     class Meta:
@@ -0,0 +1,150 @@
+from unittest import skipUnless
+
+from django.db import connection
+from django.test import TestCase
+from rest_framework.test import APITestCase
+
+from ingredients.models import Ingredient
+from interactions.models import Favorite, ShoppingCart
+from recipes.models import Recipe, RecipeIngredients
+from users.models import Subscription, User
+from utils.filters import RecipeFilter
+
+RECIPES_URL = '/api/recipes/'
+
+
+class RecipeListQueriesTest(APITestCase):
+    """Число SQL-запросов списка рецептов не зависит от размера страницы."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(5)]
+        cls.authors = [
+            User.objects.create_user(
+                email=f'author{i}@example.com', username=f'author{i}',
+                first_name='Автор', last_name=str(i), password='pass')
+            for i in range(3)]
+        cls.user = User.objects.create_user(
+            email='user@example.com', username='user',
+            first_name='Пользователь', last_name='Тестовый',
+            password='pass')
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                author=cls.authors[i % 3], name=f'Рецепт {i}',
+                text='Описание', cooking_time=i + 1,
+                image='recipes/images/test.png')
+            RecipeIngredients.objects.bulk_create(
+                RecipeIngredients(recipe=recipe, ingredient=ingredient,
+                                  amount=j + 1)
+                for j, ingredient in enumerate(cls.ingredients[:3]))
+            if i % 2:
+                Favorite.objects.create(user=cls.user, recipe=recipe)
+            if i % 3 == 0:
+                ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+        Subscription.objects.create(user=cls.user, author=cls.authors[0])
+
+    def setUp(self):
+        self.client.force_authenticate(self.user)
+
+    def get_list(self, **params):
+        response = self.client.get(RECIPES_URL, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()['results']
+
+    def test_flags_query_count_does_not_depend_on_page_size(self):
+        for limit in (2, 10):
+            with self.subTest(limit=limit), self.assertNumQueries(4):
+                results = self.get_list(limit=limit)
+            self.assertEqual(len(results), limit)
+
+    def test_flags_are_annotated_for_user(self):
+        results = self.get_list(limit=12)
+        favorited = set(Favorite.objects.filter(
+            user=self.user).values_list('recipe_id', flat=True))
+        in_cart = set(ShoppingCart.objects.filter(
+            user=self.user).values_list('recipe_id', flat=True))
+        self.assertNotEqual(favorited, in_cart)
+        for recipe in results:
+            self.assertEqual(recipe['is_favorited'],
+                             recipe['id'] in favorited)
+            self.assertEqual(recipe['is_in_shopping_cart'],
+                             recipe['id'] in in_cart)
+
+    def test_nested_author_and_ingredients_query_count(self):
+        recipe = Recipe.objects.order_by('pub_date').first()
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe, ingredient=ingredient,
+                              amount=1)
+            for ingredient in self.ingredients[3:])
+        for limit in (2, 12):
+            with self.subTest(limit=limit), self.assertNumQueries(4):
+                results = self.get_list(limit=limit)
+            for item in results:
+                self.assertEqual(item['author']['is_subscribed'],
+                                 item['author']['id'] == self.authors[0].id)
+                self.assertEqual(
+                    len(item['ingredients']),
+                    5 if item['id'] == recipe.id else 3)
+
+    def test_detail_query_count(self):
+        recipe = Recipe.objects.first()
+        with self.assertNumQueries(3):
+            response = self.client.get(f'{RECIPES_URL}{recipe.id}/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.json()['ingredients']), 3)
+
+
+@skipUnless(connection.vendor == 'postgresql',
+            'EXPLAIN проверяется в PostgreSQL')
+class RecipeFilterPlanTest(TestCase):
+    """
+    Сортировки и фильтры списка рецептов читают таблицы по индексам.
+    Последовательное сканирование запрещено в планировщике: если
+    подходящего индекса нет, в плане всё равно останется Seq Scan.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        author = User.objects.create_user(
+            email='author@example.com', username='author',
+            first_name='Автор', last_name='Тестовый', password='pass')
+        cls.ingredients = Ingredient.objects.bulk_create(
+            Ingredient(name=f'Ингредиент {i}', measurement_unit='г')
+            for i in range(50))
+        recipes = Recipe.objects.bulk_create(
+            Recipe(author=author, name=f'Рецепт {i}', text='Описание',
+                   cooking_time=i % 120 + 1, favorites_count=i % 97,
+                   image='recipes/images/test.png')
+            for i in range(2000))
+        RecipeIngredients.objects.bulk_create(
+            RecipeIngredients(recipe=recipe,
+                              ingredient=cls.ingredients[(i + j) % 50],
+                              amount=j + 1)
+            for i, recipe in enumerate(recipes) for j in range(3))
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE')
+
+    def plan(self, params):
+        queryset = RecipeFilter(
+            params, queryset=Recipe.objects.all()).qs[:10]
+        with connection.cursor() as cursor:
+            cursor.execute('SET LOCAL enable_seqscan = off')
+        return queryset.explain()
+
+    def test_filters_use_indexes(self):
+        cases = {
+            'ordering=-pub_date': {'ordering': '-pub_date'},
+            'ordering=popularity': {'ordering': 'popularity'},
+            'ordering=cooking_time': {'ordering': 'cooking_time'},
+            'cooking_time__lte': {'cooking_time__lte': 10,
+                                  'ordering': 'cooking_time'},
+            'ingredients': {'ingredients': [self.ingredients[0].pk,
+                                            self.ingredients[1].pk]},
+        }
+        for name, params in cases.items():
+            with self.subTest(name):
+                plan = self.plan(params)
+                self.assertNotIn('Seq Scan', plan)
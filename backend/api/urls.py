@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import MyUserViewSet, IngredientViewSet, RecipeViewSet
+from .views import (MyUserViewSet, IngredientViewSet, RecipeViewSet,
+                    cache_stats, metrics)
 
 router = DefaultRouter()
 router.register(r'users', MyUserViewSet, basename='users')
@@ -10,6 +11,8 @@ router.register(r'ingredients', IngredientViewSet, basename='ingredients')
 app_name = 'api'
 
 urlpatterns = [
+    path('cache/stats/', cache_stats, name='cache-stats'),
+    path('_metrics', metrics, name='metrics'),
     path('', include(router.urls)),
     path('', include('djoser.urls')),
     path('auth/', include('djoser.urls.authtoken')),
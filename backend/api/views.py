@@ -1,33 +1,70 @@
-from rest_framework import viewsets, status, filters
+from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.serializers import ValidationError
-from rest_framework.decorators import action
-from rest_framework.permissions import AllowAny, IsAuthenticated
+from rest_framework.decorators import action, api_view, permission_classes
+from rest_framework.permissions import (AllowAny, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.exceptions import PermissionDenied
-from django.db.models import Sum
-from django.http import HttpResponse
+from django.conf import settings
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.db.models import (BooleanField, Exists, F, OuterRef,
+                              Prefetch, Subquery, Value)
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.crypto import constant_time_compare
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
 from djoser.serializers import SetPasswordSerializer
 
 
+from .cache import AnonymousResponseCacheMixin, get_stats
 from .serializers import (MyUserCreateSerializer, AvatarSerializer,
                           UserWithRecipesSerializer, MyUserSerializer,
                           AvatarResponseSerializer, SubscriptionSerializer,
                           IngredientSerializer, RecipeCreateUpdateSerializer,
                           RecipeSerializer, FavoriteSerializer,
-                          ShoppingCartSerializer)
+                          ShoppingCartSerializer, RecipeIdsSerializer,
+                          ShoppingCartDownloadSerializer)
 from users.models import User, Subscription
+from ingredients.index import ingredient_index
 from ingredients.models import Ingredient
-from interactions.models import Favorite, ShoppingCart
-from recipes.models import Recipe, RecipeIngredients
+from interactions.cache import UserInteractions
+from interactions.models import (Favorite, FeedEntry, ShoppingCart,
+                                 ShoppingListItem)
+from recipes.models import Recipe, ShortLink
 from utils.filters import RecipeFilter
+from utils.images import delete_thumbnails, process_image_in_background
+from utils.metrics import registry
+from utils.pagination import (KeysetPagination,
+                              LimitOffsetOrCursorPagination,
+                              SubscriptionPagination)
 from utils.permissions import IsUserOrReadOnly
+from utils.sparse_fields import SparseFields
+from utils.shopping_list import (EXPORTERS, DEFAULT_FORMAT,
+                                 ShoppingListContentNegotiation)
 
 
 class MyUserViewSet(UserViewSet):
     queryset = User.objects.all()
     permission_classes = [IsUserOrReadOnly]
+    # Столбцы, которые не читаются, если их поля не запрошены в ?fields=.
+    sparse_columns = {
+        'avatar': ('avatar', 'avatar_srcset'),
+        'avatar_thumbnails': ('avatar_srcset',),
+        'first_name': ('first_name',),
+        'last_name': ('last_name',),
+        'recipes_count': ('recipes_count',),
+        'followers_count': ('followers_count',),
+        'following_count': ('following_count',),
+        'favorites_received': ('favorites_received',),
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ('list', 'retrieve'):
+            queryset = queryset.defer(*SparseFields.from_request(
+                self.request).deferred(self.sparse_columns))
+        return queryset
 
     def get_serializer_class(self):
         if self.action in ['create']:
@@ -44,7 +81,12 @@ class MyUserViewSet(UserViewSet):
             permission_classes=[IsAuthenticated],
             url_path='me', url_name='me')
     def me(self, request):
-        serializer = self.get_serializer(request.user)
+        user = request.user
+        if settings.AUTH_TOKEN_CACHE_TTL:
+            # Пользователь из кэша аутентификации: счётчики в нём
+            # могли измениться через update() после кэширования.
+            user.refresh_from_db(fields=User.counter_fields)
+        serializer = self.get_serializer(user)
         return Response(serializer.data)
 
     @action(detail=False, methods=['put', 'delete'],
@@ -63,12 +105,15 @@ class MyUserViewSet(UserViewSet):
 
         if 'avatar' not in serializer.validated_data:
             raise ValidationError("Поле 'avatar' обязательно.")
+        process_image_in_background(user.avatar)
 
         return Response(serializer.data, status=status.HTTP_200_OK)
 
     def delete_avatar(self, request):
         user = request.user
         if user.avatar:
+            delete_thumbnails(user.avatar)
+            user.avatar_thumbnails = []
             user.avatar.delete()
             user.save()
         return Response(status=status.HTTP_204_NO_CONTENT)
@@ -81,6 +126,7 @@ class MyUserViewSet(UserViewSet):
             return self.add_subscription(request, id)
         return self.remove_subscription(request, id)
 
+    @transaction.atomic
     def add_subscription(self, request, id=None):
         author = self.get_object()
         user = request.user
@@ -92,49 +138,117 @@ class MyUserViewSet(UserViewSet):
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def remove_subscription(self, request, id=None):
         author = self.get_object()
         user = request.user
 
-        subscription = Subscription.objects.filter(user=user, author=author)
-        if not subscription.exists():
+        deleted, _ = Subscription.objects.filter(
+            user=user, author=author).delete()
+        if not deleted:
             raise ValidationError(
                 "Вы не подписаны на этого пользователя.")
 
-        subscription.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated],
+            pagination_class=SubscriptionPagination,
             url_path='subscriptions', url_name='subscriptions')
     def subscriptions(self, request):
-        queryset = Subscription.objects.filter(user=request.user)
+        queryset = self.get_subscriptions_queryset(request)
         page = self.paginate_queryset(queryset)
         if page is not None:
-            serializer = SubscriptionSerializer(
-                page, many=True, context={'request': request})
+            serializer = self.get_serializer(page, many=True)
             return self.get_paginated_response(serializer.data)
 
-        serializer = SubscriptionSerializer(
-            queryset, many=True, context={'request': request})
+        serializer = self.get_serializer(queryset, many=True)
         return Response(serializer.data)
 
+    def get_subscriptions_queryset(self, request):
+        """
+        Авторы, на которых подписан пользователь, с первыми
+        recipes_limit рецептами, загруженными одним запросом.
+        """
+        recipes = Recipe.objects.all()
+        limit = request.query_params.get('recipes_limit')
+        if limit:
+            try:
+                limit = int(limit)
+            except (ValueError, TypeError):
+                limit = None
+        if limit and limit > 0:
+            recipes = recipes.filter(pk__in=Subquery(
+                Recipe.objects.filter(author=OuterRef('author'))
+                .values('pk')[:limit]))
+        sparse = SparseFields.from_request(request)
+        queryset = User.objects.filter(following__user=request.user).defer(
+            *sparse.deferred(self.sparse_columns)).annotate(
+            subscribed=Value(True, output_field=BooleanField()))
+        if not sparse.includes('recipes'):
+            return queryset
+        return queryset.prefetch_related(
+            Prefetch('recipes', queryset=recipes, to_attr='limited_recipes'))
+
 
 class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter]
-    filterset_fields = ['name']
-    search_fields = ['^name']
     permission_classes = [AllowAny]
     pagination_class = None
 
+    def list(self, request, *args, **kwargs):
+        return Response(ingredient_index.search(
+            prefix=request.query_params.get('search'),
+            name=request.query_params.get('name'),
+            limit=settings.INGREDIENT_SEARCH_LIMIT))
 
-class RecipeViewSet(viewsets.ModelViewSet):
+
+class RecipeViewSet(AnonymousResponseCacheMixin, viewsets.ModelViewSet):
     queryset = Recipe.objects.all()
     permission_classes = [IsUserOrReadOnly]
+    pagination_class = LimitOffsetOrCursorPagination
     filter_backends = [DjangoFilterBackend]
     filterset_class = RecipeFilter
+    # Столбцы, которые не читаются, если их поля не запрошены в ?fields=.
+    sparse_columns = {
+        'name': ('name',),
+        'text': ('text',),
+        'image': ('image', 'image_srcset'),
+        'image_thumbnails': ('image_srcset',),
+        'cooking_time': ('cooking_time',),
+        'search_vector': (),
+    }
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action not in ('list', 'retrieve', 'feed'):
+            return queryset
+        sparse = SparseFields.from_request(self.request)
+        queryset = queryset.defer(*sparse.deferred(self.sparse_columns))
+        if sparse.includes('ingredients'):
+            queryset = queryset.prefetch_related(
+                'recipe_ingredients__ingredient')
+        with_author = sparse.includes('author') and sparse.is_expanded(
+            'author')
+        if with_author:
+            queryset = queryset.select_related('author')
+
+        user = self.request.user
+        flags = {}
+        if sparse.includes('is_favorited'):
+            flags['is_favorited'] = Exists(Favorite.objects.filter(
+                user=user.pk, recipe=OuterRef('pk')))
+        if sparse.includes('is_in_shopping_cart'):
+            flags['is_in_shopping_cart'] = Exists(ShoppingCart.objects.filter(
+                user=user.pk, recipe=OuterRef('pk')))
+        if with_author and sparse.nested('author').includes('is_subscribed'):
+            flags['author_subscribed'] = Exists(Subscription.objects.filter(
+                user=user.pk, author=OuterRef('author')))
+        if not user.is_authenticated:
+            false = Value(False, output_field=BooleanField())
+            flags = dict.fromkeys(flags, false)
+        return queryset.annotate(**flags)
 
     def get_serializer_class(self):
         if self.action in ['create', 'update', 'partial_update']:
@@ -145,12 +259,19 @@ class RecipeViewSet(viewsets.ModelViewSet):
         if not self.request.user.is_authenticated:
             raise PermissionDenied(
                 "Authentication credentials were not provided.")
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        process_image_in_background(recipe.image)
+
+    def perform_update(self, serializer):
+        recipe = serializer.save()
+        if 'image' in serializer.validated_data:
+            process_image_in_background(recipe.image)
 
     @action(detail=True, methods=['get'],
             url_path='get-link', url_name='get-link')
     def get_short_link(self, request, pk):
-        url = f"{request.get_host()}/s/{pk}"
+        link = ShortLink.for_recipe(self.get_object())
+        url = f"{request.get_host()}/s/{link.code}"
         return Response(data={"short-link": url})
 
     @action(detail=True, methods=['post', 'delete'],
@@ -161,6 +282,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self.add_to_favorites(request, pk)
         return self.remove_from_favorites(request, pk)
 
+    @transaction.atomic
     def add_to_favorites(self, request, pk):
         recipe = self.get_object()
 
@@ -171,15 +293,16 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def remove_from_favorites(self, request, pk):
         recipe = self.get_object()
 
-        favorite = Favorite.objects.filter(user=request.user, recipe=recipe)
-        if not favorite.exists():
+        deleted, _ = Favorite.objects.filter(
+            user=request.user, recipe=recipe).delete()
+        if not deleted:
             raise ValidationError(
                 "Этот рецепт не находится в вашем избранном.")
 
-        favorite.delete()
         return Response(status=status.HTTP_204_NO_CONTENT)
 
     @action(detail=True, methods=['post', 'delete'],
@@ -190,6 +313,7 @@ class RecipeViewSet(viewsets.ModelViewSet):
             return self.add_to_shopping_cart(request, pk)
         return self.remove_from_shopping_cart(request, pk)
 
+    @transaction.atomic
     def add_to_shopping_cart(self, request, pk):
         recipe = self.get_object()
 
@@ -200,37 +324,137 @@ class RecipeViewSet(viewsets.ModelViewSet):
         serializer.save()
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+    @transaction.atomic
     def remove_from_shopping_cart(self, request, pk):
         recipe = self.get_object()
 
-        cart_item = ShoppingCart.objects.filter(
-            user=request.user, recipe=recipe)
-        if not cart_item.exists():
+        deleted, _ = ShoppingCart.objects.filter(
+            user=request.user, recipe=recipe).delete()
+        if not deleted:
             raise ValidationError(
                 "Этот рецепт не находится в вашей корзине.")
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    @action(detail=False, methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated],
+            url_path='favorite/bulk', url_name='favorite-bulk')
+    def favorite_bulk(self, request):
+        return self.bulk_interaction(request, Favorite)
+
+    @action(detail=False, methods=['post', 'delete'],
+            permission_classes=[IsAuthenticated],
+            url_path='shopping_cart/bulk', url_name='shopping_cart-bulk')
+    def shopping_cart_bulk(self, request):
+        return self.bulk_interaction(request, ShoppingCart)
 
-        cart_item.delete()
+    @action(detail=False, methods=['delete'],
+            permission_classes=[IsAuthenticated],
+            url_path='shopping_cart', url_name='shopping_cart-clear')
+    def clear_shopping_cart(self, request):
+        if ShoppingCart.bulk_remove(request.user):
+            UserInteractions.forget(request.user.pk, ShoppingCart)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
+    def bulk_interaction(self, request, model):
+        """
+        Пакетное добавление (POST) или удаление (DELETE) рецептов
+        с результатом по каждому переданному id.
+        """
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        ids = serializer.validated_data['recipes']
+        found = set(Recipe.objects.filter(pk__in=ids).values_list(
+            'id', flat=True))
+        if request.method == 'POST':
+            changed = model.bulk_add(
+                request.user, [pk for pk in ids if pk in found])
+            done, skipped = 'added', 'exists'
+        else:
+            changed = model.bulk_remove(
+                request.user, [pk for pk in ids if pk in found])
+            done, skipped = 'removed', 'absent'
+        changed = set(changed)
+        if changed:
+            # Пакетные операции не отправляют сигналов.
+            UserInteractions.forget(request.user.pk, model)
+        return Response({'results': [
+            {'id': pk,
+             'status': (done if pk in changed else skipped)
+             if pk in found else 'not_found'}
+            for pk in ids]})
+
+    @action(detail=False, methods=['get'],
+            permission_classes=[IsAuthenticated],
+            pagination_class=KeysetPagination,
+            url_path='feed', url_name='feed')
+    def feed(self, request):
+        """Рецепты авторов, на которых подписан пользователь."""
+        keys = self.paginate_queryset(
+            lambda before, limit: FeedEntry.timeline(
+                request.user, before, limit))
+        recipes = self.get_queryset().in_bulk([pk for _, pk in keys])
+        serializer = self.get_serializer(
+            [recipes[pk] for _, pk in keys if pk in recipes], many=True)
+        return self.get_paginated_response(serializer.data)
+
     @action(detail=False, methods=['get'],
             permission_classes=[IsAuthenticated],
+            content_negotiation_class=ShoppingListContentNegotiation,
             url_path='download_shopping_cart',
             url_name='download_shopping_cart')
     def download_shopping_cart(self, request):
-        ingredients = RecipeIngredients.objects.filter(
-            recipe__in_shopping_cart__user=request.user).values(
-            'ingredient__name', 'ingredient__measurement_unit').annotate(
-            total_amount=Sum('amount'))
-
-        content = "Список покупок:\n\n"
-        for item in ingredients:
-            content += (
-                f"{item['ingredient__name']} "
-                f"({item['ingredient__measurement_unit']}) - "
-                f"{item['total_amount']}\n"
-            )
-
-        response = HttpResponse(content, content_type='text/plain')
+        fmt = request.query_params.get('format', DEFAULT_FORMAT)
+        if fmt not in EXPORTERS:
+            raise ValidationError(
+                {'format': f'Доступные форматы: {", ".join(EXPORTERS)}.'})
+        exporter, content_type = EXPORTERS[fmt]
+
+        ingredients = ShoppingListItem.objects.filter(
+            user=request.user).values(
+            'total_amount', name=F('ingredient__name'),
+            measurement_unit=F('ingredient__measurement_unit')).order_by(
+            'name')
+        if isinstance(request._request, ASGIRequest):
+            # Под ASGI поток ответа читается в цикле событий, где ORM
+            # недоступна, поэтому строки (не больше, чем ингредиентов
+            # в справочнике) загружаются заранее.
+            ingredients = list(ingredients)
+        else:
+            ingredients = ingredients.iterator(chunk_size=2000)
+        row_serializer = ShoppingCartDownloadSerializer()
+        rows = (row_serializer.to_representation(item)
+                for item in ingredients)
+
+        response = StreamingHttpResponse(exporter(rows),
+                                         content_type=content_type)
         response['Content-Disposition'] = ('attachment; '
-                                           'filename="shopping_list.txt"')
+                                           f'filename="shopping_list.{fmt}"')
         return response
+
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def cache_stats(request):
+    """Счётчики попаданий и промахов кэша ответов."""
+    return Response(get_stats())
+
+
+def metrics(request):
+    """
+    Метрики запросов процесса в текстовом формате Prometheus.
+    Доступны только с заголовком Authorization: Bearer METRICS_TOKEN;
+    без заданного METRICS_TOKEN эндпоинт закрыт.
+    """
+    token = settings.METRICS_TOKEN
+    if not token or not constant_time_compare(
+            request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=status.HTTP_403_FORBIDDEN)
+    stats = get_stats()
+    extra = (
+        ('response_cache_hits_total', 'counter', 'Response cache hits',
+         stats['hits']),
+        ('response_cache_misses_total', 'counter', 'Response cache misses',
+         stats['misses']),
+    )
+    return HttpResponse(registry.render(extra),
+                        content_type='text/plain; version=0.0.4')
@@ -7,10 +7,41 @@ For more information on this file, see
 https://docs.djangoproject.com/en/3.2/howto/deployment/asgi/
 """
 
+import asyncio
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from asgiref.sync import ThreadSensitiveContext
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'foodgram.settings')
 
-application = get_asgi_application()
+# Django 3.2 выполняет синхронные представления и middleware в одном
+# общем потоке, поэтому каждый запрос получает свой поток. Число
+# потоков, одновременно занятых блокирующей работой, ограничено
+# ASGI_THREADS. Чтение тела запроса и отправка ответа в лимит
+# не входят: медленная загрузка или долгое скачивание не занимают
+# слот.
+blocking_slots = None
+
+
+class BoundedASGIHandler(ASGIHandler):
+
+    async def get_response_async(self, request):
+        global blocking_slots
+        if blocking_slots is None:
+            blocking_slots = asyncio.Semaphore(
+                int(os.getenv('ASGI_THREADS', default=16)))
+        async with blocking_slots:
+            return await super().get_response_async(request)
+
+
+django.setup(set_prefix=False)
+django_application = BoundedASGIHandler()
+
+
+async def application(scope, receive, send):
+    if scope['type'] != 'http':
+        return await django_application(scope, receive, send)
+    async with ThreadSensitiveContext():
+        return await django_application(scope, receive, send)
@@ -40,6 +40,7 @@ INSTALLED_APPS = [
     'django.contrib.sessions',
     'django.contrib.messages',
     'django.contrib.staticfiles',
+    'django.contrib.postgres',
     'djoser',
     'django_filters',
     'rest_framework',
@@ -52,6 +53,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'utils.metrics.RequestMetricsMiddleware',
+    'recipes.shortlinks.ShortLinkMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -147,13 +150,79 @@ STATICFILES_DIRS = []
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+MAX_IMAGE_UPLOAD_SIZE = int(os.getenv('MAX_IMAGE_UPLOAD_SIZE', default=10 * 1024 * 1024))
+MAX_IMAGE_PIXELS = int(os.getenv('MAX_IMAGE_PIXELS', default=40_000_000))
+IMAGE_MAX_DIMENSION = int(os.getenv('IMAGE_MAX_DIMENSION', default=1600))
+THUMBNAIL_SIZES = (64, 256, 1024)
+IMAGE_PROCESSING_WORKERS = int(os.getenv('IMAGE_PROCESSING_WORKERS', default=2))
+
+REQUEST_METRICS_DUPLICATES = os.getenv('REQUEST_METRICS_DUPLICATES', default='False') == 'True'
+REQUEST_METRICS_DUPLICATE_THRESHOLD = int(os.getenv('REQUEST_METRICS_DUPLICATE_THRESHOLD', default=3))
+METRICS_TOKEN = os.getenv('METRICS_TOKEN', default='')
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'foodgram.requests': {
+            'handlers': ['console'],
+            'level': os.getenv('REQUEST_LOG_LEVEL', default='INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+# Общий кэш для нескольких воркеров - Redis через django-redis:
+# CACHE_BACKEND=django_redis.cache.RedisCache,
+# CACHE_LOCATION=redis://redis:6379/1. LocMemCache годится только
+# для одного процесса: сброс поколений кэша ответов и множеств
+# взаимодействий пользователя виден лишь воркеру, который их сбросил.
+CACHE_BACKEND = os.getenv('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache')
+
+CACHES = {
+    'default': {
+        'BACKEND': CACHE_BACKEND,
+        'LOCATION': os.getenv('CACHE_LOCATION', default='foodgram'),
+    }
+}
+
+# LocMemCache у каждого процесса свой: запись, удалённая при выходе
+# или деактивации пользователя, остаётся в кэше остальных воркеров.
+# Поэтому без общего кэша токены и множества взаимодействий
+# пользователя по умолчанию не кэшируются; при одном воркере кэш можно
+# включить, задав AUTH_TOKEN_CACHE_TTL и USER_INTERACTIONS_TTL явно.
+SHARED_CACHE = not CACHE_BACKEND.endswith('.LocMemCache')
+
+AUTH_TOKEN_CACHE_TTL = int(os.getenv('AUTH_TOKEN_CACHE_TTL', default=60 if SHARED_CACHE else 0))
+
+USER_INTERACTIONS_TTL = int(os.getenv('USER_INTERACTIONS_TTL', default=30 if SHARED_CACHE else 0))
+
+RESPONSE_CACHE_ALIAS = 'default'
+RESPONSE_CACHE_TIMEOUT = int(os.getenv('RESPONSE_CACHE_TIMEOUT', default=300))
+
 REST_FRAMEWORK = {
-    'DEFAULT_AUTHENTICATION_CLASSES': ['rest_framework.authentication.TokenAuthentication',],
+    'DEFAULT_AUTHENTICATION_CLASSES': ['users.authentication.CachedTokenAuthentication',],
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny',],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.LimitOffsetPagination',
     'PAGE_SIZE': 6,
 }
 
+INGREDIENT_SEARCH_LIMIT = int(os.getenv('INGREDIENT_SEARCH_LIMIT', default=50))
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', default=300))
+
+SEARCH_CONFIG = os.getenv('SEARCH_CONFIG', default='russian')
+
+FEED_FANOUT_LIMIT = int(os.getenv('FEED_FANOUT_LIMIT', default=1000))
+FEED_BACKFILL_SIZE = int(os.getenv('FEED_BACKFILL_SIZE', default=100))
+
+SHORT_LINK_CACHE_SIZE = int(os.getenv('SHORT_LINK_CACHE_SIZE', default=10000))
+SHORT_LINK_FLUSH_INTERVAL = float(
+    os.getenv('SHORT_LINK_FLUSH_INTERVAL', default=10))
+SHORT_LINK_FLUSH_BATCH = int(os.getenv('SHORT_LINK_FLUSH_BATCH', default=500))
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'PERMISSIONS': {
@@ -1,4 +1,5 @@
 from django.contrib import admin
+from django.db.models import Count
 
 from .models import Ingredient
 
@@ -9,6 +10,11 @@ class IngredientAdmin(admin.ModelAdmin):
     search_fields = ('name',)
     list_filter = ('measurement_unit',)
 
+    def get_queryset(self, request):
+        return super().get_queryset(request).annotate(
+            recipes_total=Count('recipes'))
+
     def recipes_count(self, obj):
-        return obj.recipes.count()
+        return obj.recipes_total
     recipes_count.short_description = 'Используется в рецептах'
+    recipes_count.admin_order_field = 'recipes_total'
@@ -1,6 +1,14 @@
 from django.apps import AppConfig
+from django.db.models.signals import post_delete, post_save
 
 
 class IngredientsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'ingredients'
+
+    def ready(self):
+        from .index import ingredient_index
+        post_save.connect(ingredient_index.invalidate,
+                          sender='ingredients.Ingredient')
+        post_delete.connect(ingredient_index.invalidate,
+                            sender='ingredients.Ingredient')
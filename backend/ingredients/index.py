@@ -0,0 +1,63 @@
+import threading
+import time
+from bisect import bisect_left
+
+from django.conf import settings
+
+from .models import Ingredient
+
+
+class IngredientIndex:
+    """
+    Отсортированный по названию индекс ингредиентов в памяти процесса.
+    Загружается при первом обращении, сбрасывается сигналами модели
+    и перезагружается не реже, чем раз в INGREDIENT_INDEX_TTL секунд.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._data = None
+
+    def invalidate(self, **kwargs):
+        self._data = None
+
+    def _load(self):
+        rows = sorted(
+            ({'id': pk, 'name': name, 'measurement_unit': unit}
+             for pk, name, unit in Ingredient.objects.values_list(
+                 'id', 'name', 'measurement_unit')),
+            key=lambda row: (row['name'].casefold(), row['id']))
+        keys = [row['name'].casefold() for row in rows]
+        return keys, rows, time.monotonic()
+
+    def _get(self):
+        data = self._data
+        ttl = getattr(settings, 'INGREDIENT_INDEX_TTL', 300)
+        if data is None or time.monotonic() - data[2] > ttl:
+            with self._lock:
+                data = self._data
+                if data is None or time.monotonic() - data[2] > ttl:
+                    data = self._data = self._load()
+        return data
+
+    def search(self, prefix='', name=None, limit=None):
+        """Ингредиенты, название которых начинается с prefix."""
+        keys, rows, _ = self._get()
+        prefix = (prefix or '').casefold()
+        if name is not None:
+            if not name.casefold().startswith(prefix):
+                return []
+            prefix = name.casefold()
+        result = []
+        for i in range(bisect_left(keys, prefix), len(keys)):
+            if not keys[i].startswith(prefix):
+                break
+            if name is not None and rows[i]['name'] != name:
+                continue
+            result.append(rows[i])
+            if limit and len(result) >= limit:
+                break
+        return result
+
+
+ingredient_index = IngredientIndex()
@@ -1,19 +1,97 @@
 import csv
-from django.core.management.base import BaseCommand
+import json
+import time
+from itertools import islice
+
+from django.core.management.base import BaseCommand, CommandError
 from ingredients.models import Ingredient
 
+CHUNK_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    for row in csv.reader(file):
+        if row:
+            name, measurement_unit = row
+            yield name, measurement_unit
+
+
+def read_json(file):
+    """Читает массив объектов JSON по частям, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = ''
+    started = False
+    while True:
+        chunk = file.read(CHUNK_SIZE)
+        buffer += chunk
+        while True:
+            buffer = buffer.lstrip(' \t\r\n,')
+            if not started:
+                if not buffer:
+                    break
+                if buffer[0] != '[':
+                    raise CommandError('JSON file must contain an array')
+                buffer = buffer[1:]
+                started = True
+                continue
+            if buffer.startswith(']'):
+                return
+            try:
+                item, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise CommandError('Malformed JSON file')
+                break
+            yield item['name'], item['measurement_unit']
+            buffer = buffer[end:]
+        if not chunk:
+            return
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+}
+
 
 class Command(BaseCommand):
-    help = 'Load ingredients from CSV file'
+    help = 'Load ingredients from CSV or JSON file'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--path', default='data/ingredients.csv',
+            help='Path to the CSV or JSON file')
+        parser.add_argument(
+            '--format', choices=READERS,
+            help='File format, detected by extension if omitted')
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows inserted per query')
 
     def handle(self, *args, **options):
-        with open('data/ingredients.csv', 'r', encoding='utf-8') as file:
-            reader = csv.reader(file)
-            for row in reader:
-                name, measurement_unit = row
-                Ingredient.objects.get_or_create(
-                    name=name,
-                    measurement_unit=measurement_unit
-                )
+        path = options['path']
+        fmt = options['format'] or path.rsplit('.', 1)[-1].lower()
+        if fmt not in READERS:
+            raise CommandError(f'Unsupported file format: {fmt}')
+
+        started = time.monotonic()
+        count_before = Ingredient.objects.count()
+        total = 0
+        with open(path, 'r', encoding='utf-8') as file:
+            rows = READERS[fmt](file)
+            while True:
+                batch = [
+                    Ingredient(name=name, measurement_unit=measurement_unit)
+                    for name, measurement_unit in islice(
+                        rows, options['batch_size'])
+                ]
+                if not batch:
+                    break
+                Ingredient.objects.bulk_create(batch, ignore_conflicts=True)
+                total += len(batch)
+        inserted = Ingredient.objects.count() - count_before
+
         self.stdout.write(self.style.SUCCESS(
-            'Successfully loaded ingredients'))
+            f'Successfully loaded ingredients: {inserted} inserted, '
+            f'{total - inserted} skipped in '
+            f'{time.monotonic() - started:.2f}s'))
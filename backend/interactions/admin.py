@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import Favorite, ShoppingCart
+from .models import Favorite, FeedEntry, ShoppingCart, ShoppingListItem
 
 
 class BaseInteractionAdmin(admin.ModelAdmin):
@@ -19,3 +19,17 @@ class FavoriteAdmin(BaseInteractionAdmin):
 class ShoppingCartAdmin(BaseInteractionAdmin):
     """Админка списка покупок."""
     pass
+
+
+@admin.register(ShoppingListItem)
+class ShoppingListItemAdmin(admin.ModelAdmin):
+    """Админка сводных списков покупок."""
+    list_display = ('user', 'ingredient', 'total_amount')
+    search_fields = ('user__email', 'ingredient__name')
+
+
+@admin.register(FeedEntry)
+class FeedEntryAdmin(admin.ModelAdmin):
+    """Админка лент подписок."""
+    list_display = ('user', 'recipe', 'pub_date')
+    search_fields = ('user__email', 'recipe__name')
@@ -0,0 +1,69 @@
+from array import array
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from users.models import Subscription
+from .models import Favorite, ShoppingCart
+
+MODEL_FIELDS = {
+    Favorite: 'recipe_id',
+    ShoppingCart: 'recipe_id',
+    Subscription: 'author_id',
+}
+
+
+class UserInteractions:
+    """
+    Множества id рецептов в избранном и корзине пользователя
+    и id авторов, на которых он подписан.
+    В кэше хранятся компактными массивами, в запросе - множествами.
+    Запись удаляется сигналами после фиксации любого изменения, поэтому
+    кэш должен быть общим для воркеров; с LocMemCache он по умолчанию
+    выключен (USER_INTERACTIONS_TTL = 0).
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self._sets = {}
+
+    @classmethod
+    def for_request(cls, request):
+        """Экземпляр, общий для всех сериализаторов одного запроса."""
+        interactions = getattr(request, '_user_interactions', None)
+        if interactions is None or interactions.user != request.user:
+            interactions = cls(request.user)
+            request._user_interactions = interactions
+        return interactions
+
+    @staticmethod
+    def cache_key(user_id, model):
+        return f'user_interactions:{user_id}:{model._meta.label_lower}'
+
+    @classmethod
+    def forget(cls, user_id, model):
+        """Удаляет множество пользователя из кэша после фиксации."""
+        if settings.USER_INTERACTIONS_TTL:
+            key = cls.cache_key(user_id, model)
+            transaction.on_commit(lambda: cache.delete(key))
+
+    def get(self, model):
+        if model not in self._sets:
+            ttl = settings.USER_INTERACTIONS_TTL
+            key = self.cache_key(self.user.pk, model)
+            packed = cache.get(key) if ttl else None
+            ids = array('q')
+            if packed is None:
+                ids.extend(sorted(model.objects.filter(
+                    user=self.user).values_list(
+                    MODEL_FIELDS[model], flat=True)))
+                if ttl:
+                    cache.set(key, ids.tobytes(), ttl)
+            else:
+                ids.frombytes(packed)
+            self._sets[model] = set(ids)
+        return self._sets[model]
+
+    def has(self, model, pk):
+        return self.user.is_authenticated and pk in self.get(model)
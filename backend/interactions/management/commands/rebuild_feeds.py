@@ -0,0 +1,37 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from interactions.models import FeedEntry
+from recipes.models import Recipe
+from users.models import Subscription, User
+
+
+class Command(BaseCommand):
+    help = ('Rebuild subscription feeds from subscriptions and recipes; '
+            'relies on stored followers_count (see recount_user_stats)')
+
+    def handle(self, *args, **options):
+        authors = User.objects.filter(
+            followers_count__gt=0,
+            followers_count__lte=settings.FEED_FANOUT_LIMIT)
+        total = 0
+        with transaction.atomic():
+            FeedEntry.objects.all().delete()
+            for author in authors.iterator():
+                recipes = list(Recipe.objects.filter(author=author).order_by(
+                    '-pub_date', '-id').values_list('id', 'pub_date')[
+                    :settings.FEED_BACKFILL_SIZE])
+                if not recipes:
+                    continue
+                followers = Subscription.objects.filter(
+                    author=author).values_list('user_id', flat=True)
+                entries = FeedEntry.objects.bulk_create(
+                    (FeedEntry(user_id=user_id, recipe_id=pk,
+                               pub_date=pub_date)
+                     for user_id in followers.iterator()
+                     for pk, pub_date in recipes),
+                    batch_size=1000)
+                total += len(entries)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt feeds with {total} entries'))
@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Sum
+
+from interactions.models import ShoppingListItem
+from recipes.models import RecipeIngredients
+
+
+class Command(BaseCommand):
+    help = 'Rebuild and verify aggregated shopping lists'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Only report mismatches, do not rebuild')
+
+    def expected(self):
+        rows = RecipeIngredients.objects.filter(
+            recipe__in_shopping_cart__isnull=False).values(
+            'recipe__in_shopping_cart__user', 'ingredient').annotate(
+            total=Sum('amount')).order_by()
+        return {(row['recipe__in_shopping_cart__user'], row['ingredient']):
+                row['total'] for row in rows}
+
+    def stored(self):
+        return {(user_id, ingredient_id): total for user_id, ingredient_id,
+                total in ShoppingListItem.objects.values_list(
+                    'user_id', 'ingredient_id', 'total_amount')}
+
+    def mismatches(self):
+        expected, stored = self.expected(), self.stored()
+        return [key for key in expected.keys() | stored.keys()
+                if expected.get(key) != stored.get(key)]
+
+    def handle(self, *args, **options):
+        mismatches = self.mismatches()
+        if options['check']:
+            if mismatches:
+                raise CommandError(
+                    f'{len(mismatches)} shopping list rows are out of sync')
+            self.stdout.write(self.style.SUCCESS(
+                'Shopping lists are consistent'))
+            return
+
+        with transaction.atomic():
+            ShoppingListItem.objects.all().delete()
+            ShoppingListItem.objects.bulk_create(
+                (ShoppingListItem(user_id=user_id,
+                                  ingredient_id=ingredient_id,
+                                  total_amount=total)
+                 for (user_id, ingredient_id), total
+                 in self.expected().items()),
+                batch_size=1000)
+        if self.mismatches():
+            raise CommandError('Shopping lists are still out of sync')
+        self.stdout.write(self.style.SUCCESS(
+            f'Rebuilt shopping lists, fixed {len(mismatches)} rows'))
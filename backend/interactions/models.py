@@ -1,11 +1,47 @@
-from django.db import models
+import heapq
+from collections import Counter
+from contextvars import ContextVar
 
-from users.models import User
-from recipes.models import Recipe
+from django.conf import settings
+from django.db import models, transaction
+from django.db.models import Case, F, IntegerField, Q, Sum, Value, When
+from django.db.models.functions import Greatest
+
+from users.models import Subscription, User
+from recipes.models import Recipe, RecipeIngredients
+from ingredients.models import Ingredient
+
+
+# Установлен, пока bulk_remove удаляет строки: обработчики post_delete
+# на каждую строку пропускаются, счётчики и списки покупок
+# обновляются одним вызовом на всю пачку.
+bulk_deleting = ContextVar('bulk_deleting', default=False)
+
+
+def lock_recipes(recipe_ids):
+    """
+    Блокирует строки рецептов в порядке id. Рецепты всегда блокируются
+    раньше пользователей, как при правке рецепта и обновлении счётчиков
+    в сигналах: единый порядок исключает взаимоблокировки.
+    """
+    list(Recipe.objects.select_for_update(no_key=True).filter(
+        pk__in=recipe_ids).order_by('pk').values_list('pk', flat=True))
+
+
+def lock_users(user_ids):
+    """
+    Блокирует строки пользователей до конца транзакции в порядке id,
+    чтобы параллельные изменения их данных выполнялись по очереди.
+    """
+    list(User.objects.select_for_update().filter(
+        pk__in=list(user_ids)).order_by('pk').values_list('pk', flat=True))
 
 
 class BaseInteractionModel(models.Model):
     """Абстрактная модель для взаимодействий пользователя с рецептом."""
+    counter_field = None
+    author_counter_field = None
+
     class Meta:
         abstract = True
         constraints = [
@@ -20,9 +56,72 @@ class BaseInteractionModel(models.Model):
         """Проверяет существование взаимодействия."""
         return cls.objects.filter(user=user, recipe=recipe).exists()
 
+    @classmethod
+    def update_counters(cls, recipe_ids, delta):
+        """Атомарно изменяет счётчик взаимодействий на рецептах."""
+        field = cls.counter_field
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            **{field: Greatest(F(field) + delta, Value(0))})
+        if cls.author_counter_field:
+            authors = Counter(Recipe.objects.filter(
+                pk__in=recipe_ids).values_list('author_id', flat=True))
+            User.update_counters(cls.author_counter_field, {
+                pk: count * delta for pk, count in authors.items()})
+
+    @staticmethod
+    def lock_user(user):
+        lock_users([user.pk])
+
+    @classmethod
+    def bulk_add(cls, user, recipe_ids):
+        """
+        Добавляет рецепты одним запросом и возвращает id добавленных.
+        Строка пользователя блокируется, чтобы параллельные пакетные
+        запросы не учли одни и те же рецепты в счётчиках дважды.
+        """
+        with transaction.atomic():
+            lock_recipes(list(recipe_ids))
+            cls.lock_user(user)
+            existing = set(cls.objects.filter(
+                user=user, recipe_id__in=recipe_ids).values_list(
+                'recipe_id', flat=True))
+            added = [pk for pk in recipe_ids if pk not in existing]
+            cls.objects.bulk_create(
+                (cls(user=user, recipe_id=pk) for pk in added),
+                ignore_conflicts=True)
+            cls.update_counters(added, 1)
+        return added
+
+    @classmethod
+    def bulk_remove(cls, user, recipe_ids=None):
+        """
+        Удаляет рецепты (все, если recipe_ids не задан)
+        и возвращает id удалённых. Обработчики post_delete на каждую
+        строку пропускаются, счётчики меняются одним вызовом.
+        """
+        with transaction.atomic():
+            items = cls.objects.filter(user=user)
+            if recipe_ids is not None:
+                items = items.filter(recipe_id__in=recipe_ids)
+            lock_recipes(items.values('recipe_id'))
+            cls.lock_user(user)
+            removed = list(items.values_list('recipe_id', flat=True))
+            if removed:
+                token = bulk_deleting.set(True)
+                try:
+                    cls.objects.filter(
+                        user=user, recipe_id__in=removed).delete()
+                finally:
+                    bulk_deleting.reset(token)
+                cls.update_counters(removed, -1)
+        return removed
+
 
 class Favorite(BaseInteractionModel):
     """Модель избранного"""
+    counter_field = 'favorites_count'
+    author_counter_field = 'favorites_received'
+
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -43,6 +142,8 @@ class Favorite(BaseInteractionModel):
 
 class ShoppingCart(BaseInteractionModel):
     """Модель списка покупок"""
+    counter_field = 'in_shopping_carts_count'
+
     user = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -59,3 +160,242 @@ class ShoppingCart(BaseInteractionModel):
     class Meta(BaseInteractionModel.Meta):
         verbose_name = 'Список покупок'
         verbose_name_plural = 'Списки покупок'
+
+    @classmethod
+    def bulk_add(cls, user, recipe_ids):
+        with transaction.atomic():
+            added = super().bulk_add(user, recipe_ids)
+            ShoppingListItem.apply_delta(
+                [user.id], ShoppingListItem.recipes_amounts(added))
+        return added
+
+    @classmethod
+    def bulk_remove(cls, user, recipe_ids=None):
+        with transaction.atomic():
+            removed = super().bulk_remove(user, recipe_ids)
+            if recipe_ids is None:
+                ShoppingListItem.objects.filter(user=user).delete()
+            else:
+                ShoppingListItem.apply_delta([user.id], {
+                    pk: -amount for pk, amount in
+                    ShoppingListItem.recipes_amounts(removed).items()})
+        return removed
+
+
+class ShoppingListItem(models.Model):
+    """Сводная строка списка покупок пользователя"""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list',
+        verbose_name='Пользователь'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items',
+        verbose_name='Ингредиент'
+    )
+    total_amount = models.PositiveIntegerField(
+        default=0,
+        verbose_name='Общее количество'
+    )
+
+    class Meta:
+        verbose_name = 'Строка списка покупок'
+        verbose_name_plural = 'Строки списков покупок'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_user_ingredient_in_shopping_list'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.ingredient} - {self.total_amount} ({self.user})'
+
+    @classmethod
+    def apply_delta(cls, user_ids, deltas):
+        """
+        Изменяет количества ингредиентов в списках покупок пользователей.
+        deltas - словарь {id ингредиента: изменение количества}.
+        Строки пользователей блокируются: иначе два параллельных
+        добавления одного нового ингредиента нарушат уникальность.
+        """
+        user_ids = list(user_ids)
+        deltas = {pk: delta for pk, delta in deltas.items() if delta}
+        if not user_ids or not deltas:
+            return
+        with transaction.atomic():
+            lock_users(user_ids)
+            items = cls.objects.filter(user_id__in=user_ids,
+                                       ingredient_id__in=deltas)
+            existing = set(items.values_list('user_id', 'ingredient_id'))
+            items.update(total_amount=Greatest(
+                F('total_amount') + Case(
+                    *(When(ingredient_id=pk, then=Value(delta))
+                      for pk, delta in deltas.items()),
+                    output_field=IntegerField()),
+                Value(0)))
+            cls.objects.bulk_create(
+                cls(user_id=user_id, ingredient_id=pk, total_amount=delta)
+                for user_id in user_ids
+                for pk, delta in deltas.items()
+                if delta > 0 and (user_id, pk) not in existing)
+            cls.objects.filter(user_id__in=user_ids,
+                               total_amount__lte=0).delete()
+
+    @staticmethod
+    def recipe_amounts(recipe_id):
+        """Количества ингредиентов рецепта: {id ингредиента: количество}."""
+        return dict(RecipeIngredients.objects.filter(
+            recipe_id=recipe_id).values_list('ingredient_id', 'amount'))
+
+    @staticmethod
+    def recipes_amounts(recipe_ids):
+        """Суммарные количества ингредиентов нескольких рецептов."""
+        if not recipe_ids:
+            return {}
+        return dict(RecipeIngredients.objects.filter(
+            recipe_id__in=recipe_ids).values('ingredient_id').annotate(
+            total=Sum('amount')).values_list('ingredient_id', 'total'))
+
+    @classmethod
+    def add_recipe(cls, user_ids, recipe_id):
+        """Добавляет ингредиенты рецепта в списки покупок пользователей."""
+        cls.apply_delta(user_ids, cls.recipe_amounts(recipe_id))
+
+    @classmethod
+    def remove_recipe(cls, user_ids, recipe_id):
+        """Вычитает ингредиенты рецепта из списков покупок пользователей."""
+        cls.apply_delta(user_ids, {
+            pk: -amount
+            for pk, amount in cls.recipe_amounts(recipe_id).items()})
+
+    @classmethod
+    def cart_users(cls, recipe_id):
+        """Id пользователей, у которых рецепт в списке покупок."""
+        return list(ShoppingCart.objects.filter(
+            recipe_id=recipe_id).values_list('user_id', flat=True))
+
+
+class FeedEntry(models.Model):
+    """
+    Запись ленты подписок: рецепт автора, на которого подписан
+    пользователь. Рецепты авторов с числом подписчиков больше
+    FEED_FANOUT_LIMIT при публикации не рассылаются, а читаются
+    при запросе ленты.
+    """
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed',
+        verbose_name='Пользователь'
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='feed_entries',
+        verbose_name='Рецепт'
+    )
+    pub_date = models.DateTimeField(
+        verbose_name='Дата публикации'
+    )
+
+    class Meta:
+        verbose_name = 'Запись ленты'
+        verbose_name_plural = 'Записи лент'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'recipe'],
+                name='unique_recipe_in_feed'
+            )
+        ]
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-recipe'],
+                         name='feed_user_pub_date_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.recipe} в ленте {self.user}'
+
+    @staticmethod
+    def is_pushed(author):
+        """Рассылаются ли рецепты автора по лентам при публикации."""
+        return author.followers_count <= settings.FEED_FANOUT_LIMIT
+
+    @classmethod
+    def fan_out(cls, recipe):
+        """Добавляет новый рецепт в ленты подписчиков автора."""
+        if not cls.is_pushed(recipe.author):
+            return
+        followers = Subscription.objects.filter(
+            author_id=recipe.author_id).values_list('user_id', flat=True)
+        cls.objects.bulk_create(
+            (cls(user_id=user_id, recipe=recipe, pub_date=recipe.pub_date)
+             for user_id in followers.iterator()),
+            batch_size=1000, ignore_conflicts=True)
+
+    @classmethod
+    def backfill(cls, user_ids, author):
+        """
+        Добавляет в ленты пользователей последние FEED_BACKFILL_SIZE
+        рецептов автора. Выполняется при любой подписке, даже если
+        рецепты автора читаются при запросе: иначе после возврата
+        автора к рассылке из ленты пропадут рецепты до подписки.
+        """
+        recipes = list(Recipe.objects.filter(author=author).order_by(
+            '-pub_date', '-id').values_list('id', 'pub_date')[
+            :settings.FEED_BACKFILL_SIZE])
+        if not recipes:
+            return
+        cls.objects.bulk_create(
+            (cls(user_id=user_id, recipe_id=pk, pub_date=pub_date)
+             for user_id in user_ids for pk, pub_date in recipes),
+            batch_size=1000, ignore_conflicts=True)
+
+    @classmethod
+    def unfollow(cls, user, author):
+        """
+        Убирает рецепты автора из ленты. Если после отписки автор
+        вернулся к рассылке, ленты остальных подписчиков дополняются
+        рецептами, которые вышли без рассылки.
+        """
+        cls.objects.filter(user=user, recipe__author=author).delete()
+        followers = Subscription.objects.filter(author=author)
+        if followers.count() == settings.FEED_FANOUT_LIMIT:
+            cls.backfill(
+                followers.values_list('user_id', flat=True).iterator(),
+                author)
+
+    @classmethod
+    def timeline(cls, user, before=None, limit=10):
+        """
+        Ключи (pub_date, id рецепта) ленты пользователя по убыванию,
+        не больше limit, строго раньше ключа before. Записи таблицы
+        сливаются с рецептами авторов, читаемых при запросе.
+        """
+        sources = [(cls.objects.filter(user=user), 'recipe_id')]
+        pulled = list(User.objects.filter(
+            following__user=user,
+            followers_count__gt=settings.FEED_FANOUT_LIMIT,
+        ).values_list('id', flat=True))
+        if pulled:
+            sources.append(
+                (Recipe.objects.filter(author_id__in=pulled), 'id'))
+        rows = []
+        for queryset, id_field in sources:
+            if before is not None:
+                queryset = queryset.filter(
+                    Q(pub_date__lt=before[0])
+                    | Q(pub_date=before[0], **{f'{id_field}__lt': before[1]}))
+            rows.append(queryset.order_by('-pub_date', f'-{id_field}')
+                        .values_list('pub_date', id_field)[:limit])
+        keys, seen = [], set()
+        for key in heapq.merge(*rows, reverse=True):
+            if key[1] not in seen:
+                seen.add(key[1])
+                keys.append(key)
+                if len(keys) == limit:
+                    break
+        return keys
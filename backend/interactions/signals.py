@@ -0,0 +1,97 @@
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from recipes.models import Recipe, RecipeIngredients
+from users.models import Subscription
+from .cache import UserInteractions
+from .models import (Favorite, FeedEntry, ShoppingCart, ShoppingListItem,
+                     bulk_deleting)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+def increment_counter(sender, instance, created, **kwargs):
+    if created:
+        sender.update_counters([instance.recipe_id], 1)
+
+
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+def decrement_counter(sender, instance, **kwargs):
+    if bulk_deleting.get():
+        return
+    sender.update_counters([instance.recipe_id], -1)
+
+
+@receiver(post_save, sender=Favorite)
+@receiver(post_save, sender=ShoppingCart)
+@receiver(post_save, sender=Subscription)
+@receiver(post_delete, sender=Favorite)
+@receiver(post_delete, sender=ShoppingCart)
+@receiver(post_delete, sender=Subscription)
+def forget_interactions(sender, instance, **kwargs):
+    if bulk_deleting.get():
+        return
+    UserInteractions.forget(instance.user_id, sender)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.add_recipe([instance.user_id], instance.recipe_id)
+
+
+# При удалении рецепта каскадом удаляются и его ингредиенты, и строки
+# корзин. Каждый обработчик читает вторую сторону уже после удаления
+# своей строки, поэтому пара корзина-ингредиент вычитается ровно
+# один раз при любом порядке удаления.
+@receiver(post_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    if bulk_deleting.get():
+        return
+    ShoppingListItem.remove_recipe([instance.user_id], instance.recipe_id)
+
+
+@receiver(pre_save, sender=RecipeIngredients)
+def remember_ingredient_amount(sender, instance, raw=False, **kwargs):
+    instance._saved_amount = None
+    if instance.pk is not None and not raw:
+        instance._saved_amount = sender.objects.filter(
+            pk=instance.pk).values_list('ingredient_id', 'amount').first()
+
+
+@receiver(post_save, sender=RecipeIngredients)
+def ingredient_saved(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    deltas = {instance.ingredient_id: instance.amount}
+    saved = getattr(instance, '_saved_amount', None)
+    if saved is not None:
+        ingredient_id, amount = saved
+        deltas[ingredient_id] = deltas.get(ingredient_id, 0) - amount
+    ShoppingListItem.apply_delta(
+        ShoppingListItem.cart_users(instance.recipe_id), deltas)
+
+
+@receiver(post_delete, sender=RecipeIngredients)
+def ingredient_deleted(sender, instance, **kwargs):
+    ShoppingListItem.apply_delta(
+        ShoppingListItem.cart_users(instance.recipe_id),
+        {instance.ingredient_id: -instance.amount})
+
+
+@receiver(post_save, sender=Recipe)
+def add_to_feeds(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.fan_out(instance)
+
+
+@receiver(post_save, sender=Subscription)
+def fill_feed(sender, instance, created, **kwargs):
+    if created:
+        FeedEntry.backfill([instance.user_id], instance.author_id)
+
+
+@receiver(post_delete, sender=Subscription)
+def clear_feed(sender, instance, **kwargs):
+    FeedEntry.unfollow(instance.user_id, instance.author_id)
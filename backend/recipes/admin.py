@@ -1,6 +1,8 @@
 from django.contrib import admin
 from django.utils.html import format_html
-from .models import Recipe, RecipeIngredients
+
+from utils.images import thumbnail_url
+from .models import Recipe, RecipeIngredients, ShortLink
 
 
 class RecipeIngredientsInline(admin.TabularInline):
@@ -25,17 +27,10 @@ class RecipeAdmin(admin.ModelAdmin):
     inlines = (RecipeIngredientsInline,)
 
     def get_image(self, obj):
-        return format_html('<img src="{}" width="50"/>', obj.image.url)
+        return format_html('<img src="{}" width="50"/>',
+                           thumbnail_url(obj.image, 64))
     get_image.short_description = 'Миниатюра'
 
-    def favorites_count(self, obj):
-        return obj.favorites_count()
-    favorites_count.short_description = 'В избранном'
-
-    def in_shopping_carts_count(self, obj):
-        return obj.in_shopping_carts_count()
-    in_shopping_carts_count.short_description = 'В списках покупок'
-
 
 @admin.register(RecipeIngredients)
 class RecipeIngredientsAdmin(admin.ModelAdmin):
@@ -43,3 +38,11 @@ class RecipeIngredientsAdmin(admin.ModelAdmin):
     list_display = ('recipe', 'ingredient', 'amount')
     search_fields = ('recipe__name', 'ingredient__name')
     list_filter = ('recipe', 'ingredient')
+
+
+@admin.register(ShortLink)
+class ShortLinkAdmin(admin.ModelAdmin):
+    """Класс админки для модели ShortLink"""
+    list_display = ('code', 'recipe', 'hits', 'created')
+    search_fields = ('code', 'recipe__name')
+    readonly_fields = ('hits', 'created')
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from recipes.models import Recipe
+from users.models import User
+from utils.images import generate_thumbnails, save_thumbnails
+
+
+class Command(BaseCommand):
+    help = ('Generate missing thumbnails for recipe images and avatars '
+            'and record them in the models')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Regenerate thumbnails that already exist')
+
+    def handle(self, *args, **options):
+        created = failed = 0
+        for model, field_name in ((Recipe, 'image'), (User, 'avatar')):
+            storage = model._meta.get_field(field_name).storage
+            names = model.objects.exclude(**{field_name: ''}).values_list(
+                field_name, flat=True)
+            for name in names.iterator():
+                try:
+                    thumbnails, count = generate_thumbnails(
+                        storage, name, force=options['force'])
+                    save_thumbnails(model, field_name, name, thumbnails)
+                    created += count
+                except (OSError, ValueError) as error:
+                    failed += 1
+                    self.stderr.write(f'{name}: {error}')
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} thumbnails, {failed} images failed'))
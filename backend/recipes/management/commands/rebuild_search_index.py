@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from recipes.search import get_search_backend
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the full-text search index of recipes'
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        indexed = get_search_backend().update()
+        self.stdout.write(self.style.SUCCESS(
+            f'Indexed {indexed} recipes '
+            f'in {time.monotonic() - started:.2f}s'))
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from interactions.models import Favorite, ShoppingCart
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Recount stored favorites and shopping cart counters on recipes'
+
+    def handle(self, *args, **options):
+        for model in (Favorite, ShoppingCart):
+            field = model.counter_field
+            counts = (model.objects.filter(recipe=OuterRef('pk')).order_by()
+                      .values('recipe').annotate(total=Count('pk'))
+                      .values('total'))
+            actual = Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+            fixed = Recipe.objects.annotate(actual=actual).filter(
+                ~Q(**{field: actual})).update(**{field: actual})
+            self.stdout.write(self.style.SUCCESS(
+                f'{field}: fixed {fixed} recipes'))
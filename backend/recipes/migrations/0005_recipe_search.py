@@ -0,0 +1,67 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:11
+
+import django.contrib.postgres.search
+from django.conf import settings
+from django.contrib.postgres.operations import TrigramExtension
+from django.db import migrations
+
+INGREDIENT_NAMES = (
+    "(SELECT string_agg(i.name, ' ') "
+    'FROM recipes_recipeingredients ri '
+    'JOIN ingredients_ingredient i ON i.id = ri.ingredient_id '
+    'WHERE ri.recipe_id = recipes_recipe.id)'
+)
+
+
+def create_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute(
+            'CREATE INDEX recipe_search_vector_idx '
+            'ON recipes_recipe USING gin (search_vector)')
+        schema_editor.execute(
+            'CREATE INDEX recipe_name_trgm_idx '
+            'ON recipes_recipe USING gin (name gin_trgm_ops)')
+        schema_editor.execute(
+            'UPDATE recipes_recipe SET search_vector = '
+            "setweight(to_tsvector(%(config)s::regconfig, name), 'A') || "
+            "setweight(to_tsvector(%(config)s::regconfig, text), 'B') || "
+            'setweight(to_tsvector(%(config)s::regconfig, '
+            f"coalesce({INGREDIENT_NAMES}, '')), 'C')",
+            {'config': settings.SEARCH_CONFIG})
+    elif vendor == 'sqlite':
+        schema_editor.execute(
+            'CREATE VIRTUAL TABLE recipes_recipe_fts USING fts5('
+            'name, text, ingredients, '
+            "tokenize='unicode61 remove_diacritics 2')")
+        schema_editor.execute(
+            'INSERT INTO recipes_recipe_fts (rowid, name, text, ingredients) '
+            'SELECT id, name, text, '
+            f"{INGREDIENT_NAMES.replace('string_agg', 'group_concat')} "
+            'FROM recipes_recipe')
+
+
+def drop_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        schema_editor.execute('DROP INDEX recipe_name_trgm_idx')
+        schema_editor.execute('DROP INDEX recipe_search_vector_idx')
+    elif vendor == 'sqlite':
+        schema_editor.execute('DROP TABLE recipes_recipe_fts')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_indexes'),
+    ]
+
+    operations = [
+        TrigramExtension(),
+        migrations.AddField(
+            model_name='recipe',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True, verbose_name='Поисковый вектор'),
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
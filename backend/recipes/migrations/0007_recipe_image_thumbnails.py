@@ -0,0 +1,31 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+from utils.images import existing_thumbnails
+
+
+def fill_thumbnails(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    storage = Recipe._meta.get_field('image').storage
+    recipes = Recipe.objects.exclude(image='').only('image')
+    for recipe in recipes.iterator():
+        recipe.image_thumbnails = existing_thumbnails(storage, recipe.image.name)
+        if recipe.image_thumbnails:
+            recipe.save(update_fields=['image_thumbnails'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_shortlink'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_thumbnails',
+            field=models.JSONField(default=list, editable=False, verbose_name='Созданные миниатюры'),
+        ),
+        migrations.RunPython(fill_thumbnails, migrations.RunPython.noop),
+    ]
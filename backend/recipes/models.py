@@ -1,4 +1,6 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.db import models
+from django.db.models import Case, F, Value, When
 from django.core.validators import MinValueValidator
 
 from users.models import User
@@ -21,6 +23,11 @@ class Recipe(models.Model):
         upload_to='recipes/images/',
         verbose_name='Изображение'
     )
+    image_thumbnails = models.JSONField(
+        default=list,
+        editable=False,
+        verbose_name='Созданные миниатюры'
+    )
     text = models.TextField(
         verbose_name='Описание'
     )
@@ -37,22 +44,41 @@ class Recipe(models.Model):
         auto_now_add=True,
         verbose_name='Дата публикации'
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В избранном'
+    )
+    in_shopping_carts_count = models.PositiveIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='В списках покупок'
+    )
+    search_vector = SearchVectorField(
+        null=True,
+        editable=False,
+        verbose_name='Поисковый вектор'
+    )
 
     class Meta:
         verbose_name = 'Рецепт'
         verbose_name_plural = 'Рецепты'
         ordering = ('-pub_date',)
         default_related_name = 'recipes'
+        indexes = [
+            models.Index(fields=['-pub_date', '-id'],
+                         name='recipe_pub_date_idx'),
+            models.Index(fields=['author', '-pub_date'],
+                         name='recipe_author_pub_date_idx'),
+            models.Index(fields=['-favorites_count', '-pub_date'],
+                         name='recipe_popularity_idx'),
+            models.Index(fields=['cooking_time', '-pub_date'],
+                         name='recipe_cooking_time_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
-    def favorites_count(self):
-        return self.favorited_by.count()
-
-    def in_shopping_carts_count(self):
-        return self.in_shopping_cart.count()
-
 
 class RecipeIngredients(models.Model):
     """Модель количества ингредиентов в рецепте"""
@@ -80,7 +106,76 @@ class RecipeIngredients(models.Model):
                 name='unique_ingredient_in_recipe'
             )
         ]
+        indexes = [
+            models.Index(fields=['ingredient', 'recipe'],
+                         name='recipe_ingredient_lookup_idx'),
+        ]
         default_related_name = 'recipe_ingredients'
 
     def __str__(self):
         return f'{self.ingredient} в {self.recipe}'
+
+
+class ShortLink(models.Model):
+    """Модель короткой ссылки на рецепт"""
+    ALPHABET = ('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'
+                'abcdefghijklmnopqrstuvwxyz')
+    CODE_LENGTH = 6
+    # Нечётное и не кратное 31 число взаимно просто с 62 ** 6,
+    # поэтому умножение на него переставляет id без совпадений,
+    # и коды соседних рецептов не идут подряд.
+    MULTIPLIER = 3_760_237_157
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name='short_link',
+        verbose_name='Рецепт'
+    )
+    code = models.CharField(
+        max_length=16,
+        unique=True,
+        verbose_name='Код'
+    )
+    hits = models.PositiveBigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name='Переходы'
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name='Дата создания'
+    )
+
+    class Meta:
+        verbose_name = 'Короткая ссылка'
+        verbose_name_plural = 'Короткие ссылки'
+
+    def __str__(self):
+        return self.code
+
+    @classmethod
+    def make_code(cls, recipe_id):
+        """Код base62 фиксированной длины для id рецепта."""
+        base = len(cls.ALPHABET)
+        number = recipe_id * cls.MULTIPLIER % base ** cls.CODE_LENGTH
+        chars = []
+        for _ in range(cls.CODE_LENGTH):
+            number, rest = divmod(number, base)
+            chars.append(cls.ALPHABET[rest])
+        return ''.join(reversed(chars))
+
+    @classmethod
+    def for_recipe(cls, recipe):
+        link, _ = cls.objects.get_or_create(
+            recipe=recipe, defaults={'code': cls.make_code(recipe.pk)})
+        return link
+
+    @classmethod
+    def add_hits(cls, counts):
+        """Прибавляет переходы одним запросом: {код: количество}."""
+        if counts:
+            cls.objects.filter(code__in=counts).update(hits=F('hits') + Case(
+                *(When(code=code, then=Value(count))
+                  for code, count in counts.items()),
+                default=Value(0), output_field=models.BigIntegerField()))
@@ -0,0 +1,119 @@
+import re
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVector, TrigramSimilarity)
+from django.db import connection
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, Value
+from django.db.models.expressions import RawSQL
+
+from ingredients.models import Ingredient
+from .models import Recipe, RecipeIngredients
+
+WORD_RE = re.compile(r'\w+')
+
+
+class PostgresSearchBackend:
+    """
+    Поиск по хранимому tsvector (название, описание и названия
+    ингредиентов с весами A, B, C) с GIN-индексом. Опечатки в названии
+    находятся через pg_trgm.
+    """
+
+    def search(self, queryset, query):
+        search_query = SearchQuery(query, config=settings.SEARCH_CONFIG,
+                                   search_type='websearch')
+        return queryset.filter(
+            Q(search_vector=search_query) | Q(name__trigram_similar=query)
+        ).annotate(search_rank=(
+            SearchRank(F('search_vector'), search_query)
+            + TrigramSimilarity('name', query)))
+
+    def update(self, recipe_ids=None):
+        config = settings.SEARCH_CONFIG
+        names = (RecipeIngredients.objects.filter(recipe=OuterRef('pk'))
+                 .order_by().values('recipe')
+                 .annotate(names=StringAgg('ingredient__name', ' '))
+                 .values('names'))
+        recipes = Recipe.objects.all()
+        if recipe_ids is not None:
+            recipes = recipes.filter(pk__in=list(recipe_ids))
+        return recipes.update(search_vector=(
+            SearchVector('name', weight='A', config=config)
+            + SearchVector('text', weight='B', config=config)
+            + SearchVector(Subquery(names), weight='C', config=config)))
+
+
+class SQLiteSearchBackend:
+    """
+    Поиск через виртуальную таблицу FTS5 для локальной разработки.
+    Каждое слово запроса ищется как префикс, релевантность - bm25.
+    """
+    table = 'recipes_recipe_fts'
+    weights = (10.0, 5.0, 2.0)
+
+    def match_expression(self, query):
+        return ' '.join(
+            f'"{word}"*' for word in WORD_RE.findall(query.lower()))
+
+    def search(self, queryset, query):
+        match = self.match_expression(query)
+        if not match:
+            return queryset.none().annotate(
+                search_rank=Value(0.0, output_field=FloatField()))
+        weights = ', '.join(map(str, self.weights))
+        return queryset.filter(pk__in=RawSQL(
+            f'SELECT rowid FROM {self.table} WHERE {self.table} MATCH %s',
+            (match,))
+        ).annotate(search_rank=RawSQL(
+            f'SELECT -bm25({self.table}, {weights}) FROM {self.table} '
+            f'WHERE {self.table} MATCH %s '
+            f'AND rowid = {Recipe._meta.db_table}.id',
+            (match,), output_field=FloatField()))
+
+    def update(self, recipe_ids=None):
+        recipe_table = Recipe._meta.db_table
+        delete_where = insert_where = ''
+        params = []
+        if recipe_ids is not None:
+            params = list(recipe_ids)
+            if not params:
+                return 0
+            placeholders = ', '.join(['%s'] * len(params))
+            delete_where = f'WHERE rowid IN ({placeholders})'
+            insert_where = f'WHERE id IN ({placeholders})'
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'DELETE FROM {self.table} {delete_where}', params)
+            cursor.execute(
+                f'INSERT INTO {self.table} (rowid, name, text, ingredients) '
+                f"SELECT id, name, text, (SELECT group_concat(i.name, ' ') "
+                f'FROM {RecipeIngredients._meta.db_table} ri '
+                f'JOIN {Ingredient._meta.db_table} i '
+                f'ON i.id = ri.ingredient_id '
+                f'WHERE ri.recipe_id = {recipe_table}.id) '
+                f'FROM {recipe_table} {insert_where}', params)
+            return cursor.rowcount
+
+
+class SimpleSearchBackend:
+    """Поиск без индекса для прочих СУБД."""
+
+    def search(self, queryset, query):
+        return queryset.filter(
+            Q(name__icontains=query) | Q(text__icontains=query)
+        ).annotate(search_rank=Value(0.0, output_field=FloatField()))
+
+    def update(self, recipe_ids=None):
+        return 0
+
+
+BACKENDS = {
+    'postgresql': PostgresSearchBackend(),
+    'sqlite': SQLiteSearchBackend(),
+}
+
+
+def get_search_backend():
+    return BACKENDS.get(connection.vendor, SimpleSearchBackend())
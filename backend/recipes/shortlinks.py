@@ -0,0 +1,128 @@
+import atexit
+import logging
+import threading
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from django.db import connection
+from django.http import HttpResponseNotFound, HttpResponseRedirect
+
+from .models import Recipe, ShortLink
+
+logger = logging.getLogger(__name__)
+
+PREFIX = '/s/'
+MAX_CODE_LENGTH = ShortLink._meta.get_field('code').max_length
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш код -> id рецепта."""
+
+    def __init__(self, size):
+        self.size = size
+        self._lock = threading.Lock()
+        self._data = OrderedDict()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._data:
+                return None
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.size:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+
+class HitRecorder:
+    """
+    Копит переходы по ссылкам в памяти и записывает их пачкой
+    из фонового потока раз в SHORT_LINK_FLUSH_INTERVAL секунд
+    или по накоплении SHORT_LINK_FLUSH_BATCH переходов.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = Counter()
+        self._wakeup = threading.Event()
+        self._thread = None
+
+    def record(self, code):
+        with self._lock:
+            self._pending[code] += 1
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='short-link-hits', daemon=True)
+                self._thread.start()
+            if sum(self._pending.values()) >= settings.SHORT_LINK_FLUSH_BATCH:
+                self._wakeup.set()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, Counter()
+        if not pending:
+            return
+        try:
+            ShortLink.add_hits(pending)
+        except Exception:
+            logger.exception('Failed to save short link hits')
+            with self._lock:
+                self._pending.update(pending)
+
+    def _run(self):
+        while True:
+            self._wakeup.wait(settings.SHORT_LINK_FLUSH_INTERVAL)
+            self._wakeup.clear()
+            self.flush()
+            connection.close()
+
+
+links = LRUCache(settings.SHORT_LINK_CACHE_SIZE)
+hits = HitRecorder()
+atexit.register(hits.flush)
+
+
+def resolve(code):
+    """
+    Id рецепта по коду ссылки или None. Числовой код без записи
+    в таблице - старая ссылка вида /s/<id>.
+    """
+    recipe_id = links.get(code)
+    if recipe_id is not None:
+        return recipe_id
+    recipe_id = ShortLink.objects.filter(code=code).values_list(
+        'recipe_id', flat=True).first()
+    if recipe_id is None and code.isdigit():
+        recipe_id = Recipe.objects.filter(pk=int(code)).values_list(
+            'pk', flat=True).first()
+    if recipe_id is not None:
+        links.set(code, recipe_id)
+    return recipe_id
+
+
+class ShortLinkMiddleware:
+    """
+    Отвечает на /s/<код> перенаправлением на страницу рецепта
+    до сессий, аутентификации и DRF. Переходы пишутся асинхронно.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        if not request.path.startswith(PREFIX):
+            return self.get_response(request)
+        code = request.path[len(PREFIX):].strip('/')
+        recipe_id = resolve(code) if 0 < len(code) <= MAX_CODE_LENGTH else None
+        if recipe_id is None:
+            return HttpResponseNotFound()
+        hits.record(code)
+        return HttpResponseRedirect(f'/recipes/{recipe_id}')
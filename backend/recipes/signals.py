@@ -0,0 +1,55 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from ingredients.models import Ingredient
+from users.models import User
+from .models import Recipe, RecipeIngredients, ShortLink
+from .search import get_search_backend
+from .shortlinks import links
+
+
+def update_search_on_commit(recipe_ids):
+    recipe_ids = list(recipe_ids)
+    transaction.on_commit(
+        lambda: get_search_backend().update(recipe_ids))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+def recipe_changed(sender, instance, **kwargs):
+    update_search_on_commit([instance.pk])
+
+
+@receiver(post_save, sender=Recipe)
+def increment_recipes_count(sender, instance, created, **kwargs):
+    if created:
+        User.update_counters('recipes_count', {instance.author_id: 1})
+
+
+@receiver(post_delete, sender=Recipe)
+def decrement_recipes_count(sender, instance, **kwargs):
+    User.update_counters('recipes_count', {instance.author_id: -1})
+
+
+@receiver(post_save, sender=RecipeIngredients)
+@receiver(post_delete, sender=RecipeIngredients)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    update_search_on_commit([instance.recipe_id])
+
+
+@receiver(post_save, sender=Ingredient)
+def ingredient_changed(sender, instance, created, **kwargs):
+    if not created:
+        update_search_on_commit(RecipeIngredients.objects.filter(
+            ingredient=instance).values_list('recipe_id', flat=True))
+
+
+@receiver(post_delete, sender=Recipe)
+def forget_legacy_link(sender, instance, **kwargs):
+    links.pop(str(instance.pk))
+
+
+@receiver(post_delete, sender=ShortLink)
+def forget_short_link(sender, instance, **kwargs):
+    links.pop(instance.code)
@@ -3,24 +3,32 @@ from django.contrib.auth.admin import UserAdmin
 from .models import User, Subscription
 from django.utils.html import format_html
 
+from utils.images import thumbnail_url
+
 
 @admin.register(User)
 class MyUserAdmin(UserAdmin):
     """Админка пользователей"""
     list_display = ('email', 'username', 'first_name', 'last_name',
-                    'is_staff', 'is_active', 'date_joined', 'avatar_preview')
+                    'recipes_count', 'followers_count', 'is_staff',
+                    'is_active', 'date_joined', 'avatar_preview')
     search_fields = ('email', 'username')
     list_filter = ('is_staff', 'is_active', 'date_joined')
-    readonly_fields = ('date_joined', 'last_login', 'avatar_preview')
+    readonly_fields = ('date_joined', 'last_login', 'avatar_preview',
+                       'recipes_count', 'followers_count', 'following_count',
+                       'favorites_received')
     fieldsets = (
         (None, {'fields': ('email', 'password')}),
         ('Personal info', {'fields': ('first_name', 'last_name', 'avatar')}),
         ('Permissions', {'fields': ('is_active', 'is_staff', 'is_superuser')}),
         ('Important dates', {'fields': ('last_login', 'date_joined')}),
+        ('Stats', {'fields': ('recipes_count', 'followers_count',
+                              'following_count', 'favorites_received')}),
     )
 
     def avatar_preview(self, obj):
-        return format_html('<img src="{}" width="50"/>', obj.avatar.url)
+        return format_html('<img src="{}" width="50"/>',
+                           thumbnail_url(obj.avatar, 64))
     avatar_preview.short_description = 'Аватар'
 
 
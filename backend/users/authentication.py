@@ -0,0 +1,33 @@
+import hashlib
+
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework.authentication import TokenAuthentication
+
+
+def token_cache_key(key):
+    return f'auth_token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+
+def forget_tokens(keys):
+    cache.delete_many([token_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    TokenAuthentication, хранящая токен вместе с пользователем в кэше
+    AUTH_TOKEN_CACHE_TTL секунд. Запись удаляется при выходе,
+    сохранении пользователя (смена пароля, деактивация) и его удалении.
+    Удаление видно всем воркерам только при общем кэше, поэтому
+    с LocMemCache кэш по умолчанию выключен (AUTH_TOKEN_CACHE_TTL = 0).
+    """
+
+    def authenticate_credentials(self, key):
+        if not settings.AUTH_TOKEN_CACHE_TTL:
+            return super().authenticate_credentials(key)
+        cache_key = token_cache_key(key)
+        token = cache.get(cache_key)
+        if token is None:
+            user, token = super().authenticate_credentials(key)
+            cache.set(cache_key, token, settings.AUTH_TOKEN_CACHE_TTL)
+        return token.user, token
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+
+from interactions.models import Favorite
+from recipes.models import Recipe
+from users.models import Subscription, User
+
+STATS = (
+    ('recipes_count', Recipe, 'author'),
+    ('followers_count', Subscription, 'author'),
+    ('following_count', Subscription, 'user'),
+    ('favorites_received', Favorite, 'recipe__author'),
+)
+
+
+class Command(BaseCommand):
+    help = 'Recount stored recipe, subscription and favorite stats on users'
+
+    def handle(self, *args, **options):
+        for field, model, lookup in STATS:
+            counts = (model.objects.filter(**{lookup: OuterRef('pk')})
+                      .order_by().values(lookup)
+                      .annotate(total=Count('pk')).values('total'))
+            actual = Coalesce(Subquery(counts, output_field=IntegerField()), 0)
+            fixed = User.objects.annotate(actual=actual).filter(
+                ~Q(**{field: actual})).update(**{field: actual})
+            self.stdout.write(self.style.SUCCESS(
+                f'{field}: fixed {fixed} users'))
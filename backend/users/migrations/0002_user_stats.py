@@ -0,0 +1,55 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:16
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Subscription = apps.get_model('users', 'Subscription')
+    Favorite = apps.get_model('interactions', 'Favorite')
+    for field, queryset, lookup in (
+            ('recipes_count', Recipe.objects, 'author'),
+            ('followers_count', Subscription.objects, 'author'),
+            ('following_count', Subscription.objects, 'user'),
+            ('favorites_received', Favorite.objects, 'recipe__author')):
+        counts = (queryset.filter(**{lookup: OuterRef('pk')}).order_by()
+                  .values(lookup).annotate(total=Count('pk'))
+                  .values('total'))
+        User.objects.update(**{field: Coalesce(
+            Subquery(counts, output_field=IntegerField()), 0)})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_initial'),
+        ('recipes', '0006_shortlink'),
+        ('interactions', '0004_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='favorites_received',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецептов автора в избранном'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='followers_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписчиков'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='following_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Подписок'),
+        ),
+        migrations.AddField(
+            model_name='user',
+            name='recipes_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Рецептов'),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
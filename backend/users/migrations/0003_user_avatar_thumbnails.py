@@ -0,0 +1,31 @@
+# Generated by Django 3.2.16 on 2026-10-18 03:56
+
+from django.db import migrations, models
+
+from utils.images import existing_thumbnails
+
+
+def fill_thumbnails(apps, schema_editor):
+    User = apps.get_model('users', 'User')
+    storage = User._meta.get_field('avatar').storage
+    users = User.objects.exclude(avatar='').only('avatar')
+    for user in users.iterator():
+        user.avatar_thumbnails = existing_thumbnails(storage, user.avatar.name)
+        if user.avatar_thumbnails:
+            user.save(update_fields=['avatar_thumbnails'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0002_user_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='user',
+            name='avatar_thumbnails',
+            field=models.JSONField(default=list, editable=False, verbose_name='Созданные миниатюры'),
+        ),
+        migrations.RunPython(fill_thumbnails, migrations.RunPython.noop),
+    ]
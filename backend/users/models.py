@@ -1,5 +1,10 @@
+from collections import defaultdict
+
 from django.db import models
 from django.contrib.auth.models import AbstractUser
+from django.db.models import F, Value
+from django.db.models.functions import Greatest
+
 from django.core.validators import RegexValidator
 
 
@@ -28,6 +33,34 @@ class User(AbstractUser):
         upload_to='users/avatars/',
         blank=True
     )
+    avatar_thumbnails = models.JSONField(
+        verbose_name='Созданные миниатюры',
+        default=list,
+        editable=False
+    )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Подписчиков',
+        default=0,
+        editable=False
+    )
+    following_count = models.PositiveIntegerField(
+        verbose_name='Подписок',
+        default=0,
+        editable=False
+    )
+    favorites_received = models.PositiveIntegerField(
+        verbose_name='Рецептов автора в избранном',
+        default=0,
+        editable=False
+    )
+
+    counter_fields = ('recipes_count', 'followers_count',
+                      'following_count', 'favorites_received')
 
     USERNAME_FIELD = 'email'
     REQUIRED_FIELDS = ['username', 'first_name', 'last_name']
@@ -43,6 +76,20 @@ class User(AbstractUser):
     def is_subscribed(self, user):
         return self.following.filter(user=user).exists()
 
+    @classmethod
+    def update_counters(cls, field, deltas):
+        """
+        Атомарно изменяет счётчик field пользователей,
+        deltas - словарь {id пользователя: изменение}.
+        """
+        by_delta = defaultdict(list)
+        for pk, delta in deltas.items():
+            if delta:
+                by_delta[delta].append(pk)
+        for delta, pks in by_delta.items():
+            cls.objects.filter(pk__in=pks).update(
+                **{field: Greatest(F(field) + delta, Value(0))})
+
 
 class Subscription(models.Model):
     """Модель подписки на авторов"""
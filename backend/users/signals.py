@@ -0,0 +1,44 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_tokens
+from .models import Subscription, User
+
+# Кэш очищается сразу и ещё раз после фиксации транзакции: иначе
+# параллельный запрос успеет закэшировать ещё не изменённую запись.
+# При AUTH_TOKEN_CACHE_TTL = 0 токены не кэшируются и чистить нечего.
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, **kwargs):
+    if not settings.AUTH_TOKEN_CACHE_TTL:
+        return
+    keys = list(Token.objects.filter(user=instance).values_list(
+        'key', flat=True))
+    if keys:
+        forget_tokens(keys)
+        transaction.on_commit(lambda: forget_tokens(keys))
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    if not settings.AUTH_TOKEN_CACHE_TTL:
+        return
+    forget_tokens([instance.key])
+    transaction.on_commit(lambda: forget_tokens([instance.key]))
+
+
+@receiver(post_save, sender=Subscription)
+def increment_subscription_counters(sender, instance, created, **kwargs):
+    if created:
+        User.update_counters('following_count', {instance.user_id: 1})
+        User.update_counters('followers_count', {instance.author_id: 1})
+
+
+@receiver(post_delete, sender=Subscription)
+def decrement_subscription_counters(sender, instance, **kwargs):
+    User.update_counters('following_count', {instance.user_id: -1})
+    User.update_counters('followers_count', {instance.author_id: -1})
@@ -1,14 +1,79 @@
 from rest_framework import serializers
-from django.core.files.base import ContentFile
+from django.conf import settings
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from PIL import Image
 import base64
+import binascii
+
+CHUNK_SIZE = 64 * 1024
+
+
+class DecodedImageFile(TemporaryUploadedFile):
+    """
+    Декодированное изображение во временном файле. Хранилище переносит
+    такой файл на место вместо копирования, поэтому при сборке мусора
+    он закрывается без попытки удалить уже перенесённый путь.
+    """
+
+    def __del__(self):
+        self.close()
 
 
 class MyBase64ImageField(serializers.ImageField):
     """Кастомное поле для обработки изображений в base64"""
+    default_error_messages = {
+        'too_large': 'Размер изображения не должен превышать {max_size} байт.',
+        'too_many_pixels': ('Изображение не должно содержать '
+                            'больше {max_pixels} пикселей.'),
+    }
 
     def to_internal_value(self, data):
         if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+            data = self.decode(data)
         return super().to_internal_value(data)
+
+    def decode(self, data):
+        """
+        Декодирует base64 по частям во временный файл на диске и проверяет
+        размеры изображения по заголовку. У файла есть temporary_file_path(),
+        поэтому ImageField проверяет изображение с диска, не читая его
+        целиком в память.
+        """
+        header_end = data.find(';base64,')
+        if header_end == -1:
+            self.fail('invalid_image')
+        ext = data[:header_end].split('/')[-1]
+        start = header_end + len(';base64,')
+        max_size = settings.MAX_IMAGE_UPLOAD_SIZE
+        if (len(data) - start) * 3 // 4 > max_size:
+            self.fail('too_large', max_size=max_size)
+
+        file = DecodedImageFile('temp.' + ext, 'image/' + ext, 0, None)
+        rest = ''
+        try:
+            for offset in range(start, len(data), CHUNK_SIZE):
+                chunk = data[offset:offset + CHUNK_SIZE]
+                chunk = rest + ''.join(chunk.split())
+                aligned = len(chunk) - len(chunk) % 4
+                file.write(base64.b64decode(chunk[:aligned]))
+                rest = chunk[aligned:]
+            if rest:
+                file.write(base64.b64decode(rest + '=' * (-len(rest) % 4)))
+        except (binascii.Error, ValueError):
+            file.close()
+            self.fail('invalid_image')
+
+        file.size = file.tell()
+        file.seek(0)
+        try:
+            with Image.open(file) as image:
+                width, height = image.size
+        except Exception:
+            file.close()
+            self.fail('invalid_image')
+        max_pixels = settings.MAX_IMAGE_PIXELS
+        if width * height > max_pixels:
+            file.close()
+            self.fail('too_many_pixels', max_pixels=max_pixels)
+        file.seek(0)
+        return file
@@ -1,15 +1,38 @@
 from django_filters import rest_framework as filters
+from ingredients.models import Ingredient
 from recipes.models import Recipe
+from recipes.search import get_search_backend
 
 
 class RecipeFilter(filters.FilterSet):
+    ORDERINGS = {
+        'popularity': ('-favorites_count', '-pub_date', '-id'),
+        'cooking_time': ('cooking_time', '-pub_date', '-id'),
+        '-pub_date': ('-pub_date', '-id'),
+    }
+
+    search = filters.CharFilter(method='filter_search')
     is_favorited = filters.BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = filters.BooleanFilter(
         method='filter_is_in_shopping_cart')
+    cooking_time__lte = filters.NumberFilter(
+        field_name='cooking_time', lookup_expr='lte')
+    ingredients = filters.ModelMultipleChoiceFilter(
+        queryset=Ingredient.objects.all(), conjoined=True)
+    ordering = filters.ChoiceFilter(
+        choices=[(key, key) for key in ORDERINGS], method='filter_ordering')
 
     class Meta:
         model = Recipe
-        fields = ['author', 'is_favorited', 'is_in_shopping_cart']
+        fields = ['search', 'author', 'is_favorited', 'is_in_shopping_cart',
+                  'cooking_time__lte', 'ingredients', 'ordering']
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return get_search_backend().search(queryset, value).order_by(
+            '-search_rank', '-pub_date', '-id')
 
     def filter_is_favorited(self, queryset, name, value):
         if value and self.request.user.is_authenticated:
@@ -20,3 +43,6 @@ class RecipeFilter(filters.FilterSet):
         if value and self.request.user.is_authenticated:
             return queryset.filter(in_shopping_cart__user=self.request.user)
         return queryset
+
+    def filter_ordering(self, queryset, name, value):
+        return queryset.order_by(*self.ORDERINGS[value])
@@ -0,0 +1,198 @@
+import logging
+import os
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import connections, transaction
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+
+
+def get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=settings.IMAGE_PROCESSING_WORKERS,
+            thread_name_prefix='image-processing')
+    return _executor
+
+
+def thumbnail_name(name, size):
+    """Имя миниатюры размера size, хранящейся рядом с оригиналом."""
+    return f'{os.path.splitext(name)[0]}_{size}.webp'
+
+
+def thumbnails_field_name(field_name):
+    """Поле модели со списком созданных миниатюр изображения field_name."""
+    return f'{field_name}_thumbnails'
+
+
+def created_thumbnails(field_file):
+    """
+    Имена созданных миниатюр из поля модели, без обращений к хранилищу.
+    Миниатюры прежнего изображения не подходят по имени и пропускаются.
+    """
+    if not field_file:
+        return set()
+    return set(getattr(field_file.instance,
+                       thumbnails_field_name(field_file.field.name), ()))
+
+
+def thumbnail_url(field_file, size):
+    """URL миниатюры, если она уже создана, иначе URL оригинала."""
+    if not field_file:
+        return ''
+    name = thumbnail_name(field_file.name, size)
+    if name in created_thumbnails(field_file):
+        return field_file.storage.url(name)
+    return field_file.url
+
+
+def thumbnail_srcset(field_file):
+    """
+    Пары (URL, ширина) созданных миниатюр. Миниатюра размера size
+    имеет ширину ровно size, ещё не созданные пропускаются.
+    """
+    created = created_thumbnails(field_file)
+    srcset = []
+    for size in settings.THUMBNAIL_SIZES:
+        name = thumbnail_name(field_file.name, size)
+        if name in created:
+            srcset.append((field_file.storage.url(name), size))
+    return srcset
+
+
+def existing_thumbnails(storage, name):
+    """Имена миниатюр изображения, которые уже есть в хранилище."""
+    return [thumbnail_name(name, size) for size in settings.THUMBNAIL_SIZES
+            if storage.exists(thumbnail_name(name, size))]
+
+
+def generate_thumbnails(storage, name, force=False):
+    """
+    Создаёт WebP-миниатюры шириной THUMBNAIL_SIZES. Изображение
+    не увеличивается: размеры не меньше ширины оригинала пропускаются.
+    Возвращает имена всех миниатюр изображения и число созданных.
+    """
+    thumbnails = [] if force else existing_thumbnails(storage, name)
+    sizes = [size for size in settings.THUMBNAIL_SIZES
+             if thumbnail_name(name, size) not in thumbnails]
+    if not sizes:
+        return thumbnails, 0
+    created = 0
+    with storage.open(name) as file, Image.open(file) as image:
+        image = ImageOps.exif_transpose(image)
+        if image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        for size in sorted(sizes, reverse=True):
+            if size >= image.width:
+                storage.delete(thumbnail_name(name, size))
+                continue
+            image.thumbnail((size, image.height))
+            output = tempfile.SpooledTemporaryFile()
+            with output:
+                image.save(output, format='WEBP', quality=80)
+                output.seek(0)
+                replace_file(storage, thumbnail_name(name, size), output)
+            thumbnails.append(thumbnail_name(name, size))
+            created += 1
+    return thumbnails, created
+
+
+def save_thumbnails(model, field_name, name, thumbnails):
+    """
+    Запоминает миниатюры в объектах, у которых изображение всё ещё name:
+    если его успели заменить, список нового изображения не затирается.
+    """
+    model.objects.filter(**{field_name: name}).update(
+        **{thumbnails_field_name(field_name): sorted(thumbnails)})
+
+
+def delete_thumbnails(field_file):
+    for size in settings.THUMBNAIL_SIZES:
+        field_file.storage.delete(thumbnail_name(field_file.name, size))
+
+
+def process_image(storage, name):
+    """
+    Уменьшает изображение до IMAGE_MAX_DIMENSION по большей стороне,
+    пережимает его, заменяя исходный файл, и создаёт миниатюры.
+    Возвращает имена созданных миниатюр.
+    """
+    output = tempfile.SpooledTemporaryFile()
+    with storage.open(name) as file, Image.open(file) as image:
+        image_format = image.format
+        image = ImageOps.exif_transpose(image)
+        max_dimension = settings.IMAGE_MAX_DIMENSION
+        image.thumbnail((max_dimension, max_dimension))
+        if image_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        image.save(output, format=image_format, optimize=True,
+                   **({'quality': 85} if image_format == 'JPEG' else {}))
+    with output:
+        output.seek(0)
+        replace_file(storage, name, output)
+    thumbnails, _ = generate_thumbnails(storage, name, force=True)
+    return thumbnails
+
+
+def replace_file(storage, name, content):
+    try:
+        path = storage.path(name)
+    except NotImplementedError:
+        storage.delete(name)
+        storage.save(name, ContentFile(content.read()))
+        return
+    directory = os.path.dirname(path)
+    os.makedirs(directory, exist_ok=True)
+    with tempfile.NamedTemporaryFile(dir=directory, delete=False) as tmp:
+        tmp.write(content.read())
+    os.chmod(tmp.name, 0o644)
+    os.replace(tmp.name, path)
+
+
+def _run(model, field_name, storage, name):
+    try:
+        thumbnails = process_image(storage, name)
+        save_thumbnails(model, field_name, name, thumbnails)
+    except Exception:
+        logger.exception('Image processing failed for %s', name)
+        return None
+    return thumbnails
+
+
+def _run_in_thread(*args):
+    try:
+        _run(*args)
+    finally:
+        # Соединение с БД принадлежит потоку пула и иначе не закрывается.
+        connections.close_all()
+
+
+def process_image_in_background(field_file):
+    """
+    Ставит обработку загруженного изображения в пул потоков
+    после фиксации транзакции. При IMAGE_PROCESSING_WORKERS = 0
+    обработка выполняется синхронно и список миниатюр сразу
+    попадает в объект.
+    """
+    if not field_file:
+        return
+    instance, field_name = field_file.instance, field_file.field.name
+    args = (type(instance), field_name, field_file.storage, field_file.name)
+
+    def submit():
+        if settings.IMAGE_PROCESSING_WORKERS:
+            get_executor().submit(_run_in_thread, *args)
+            return
+        thumbnails = _run(*args)
+        if thumbnails is not None:
+            setattr(instance, thumbnails_field_name(field_name),
+                    sorted(thumbnails))
+
+    transaction.on_commit(submit)
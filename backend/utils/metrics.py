@@ -0,0 +1,179 @@
+import json
+import logging
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import connection
+from django.http import FileResponse
+
+logger = logging.getLogger('foodgram.requests')
+
+
+class MetricsRegistry:
+    """Накопленные метрики запросов процесса по представлениям."""
+    FIELDS = ('requests', 'duration', 'db_queries', 'db_duration',
+              'duplicate_queries')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = defaultdict(lambda: dict.fromkeys(self.FIELDS, 0))
+        self._statuses = Counter()
+
+    def record(self, view, method, status, timings, duplicates):
+        with self._lock:
+            data = self._views[(view, method)]
+            data['requests'] += 1
+            data['duration'] += timings['total']
+            data['db_queries'] += timings['queries']
+            data['db_duration'] += timings['db']
+            data['duplicate_queries'] += duplicates
+            self._statuses[(view, method, status)] += 1
+
+    def render(self, extra=()):
+        """Метрики в текстовом формате Prometheus."""
+        with self._lock:
+            views = {key: dict(value) for key, value in self._views.items()}
+            statuses = dict(self._statuses)
+        lines = []
+        metrics = (
+            ('requests_total', 'counter', 'HTTP requests', None),
+            ('request_duration_seconds_sum', 'counter',
+             'Total request time', 'duration'),
+            ('db_queries_total', 'counter', 'SQL queries', 'db_queries'),
+            ('db_duration_seconds_sum', 'counter', 'Total SQL time',
+             'db_duration'),
+            ('duplicate_queries_total', 'counter',
+             'Repeated identical SQL queries', 'duplicate_queries'),
+        )
+        for name, kind, description, field in metrics:
+            lines.append(f'# HELP foodgram_{name} {description}')
+            lines.append(f'# TYPE foodgram_{name} {kind}')
+            if field is None:
+                for (view, method, status), value in sorted(statuses.items()):
+                    lines.append(
+                        f'foodgram_{name}{{view="{view}",method="{method}",'
+                        f'status="{status}"}} {value}')
+                continue
+            for (view, method), data in sorted(views.items()):
+                lines.append(
+                    f'foodgram_{name}{{view="{view}",method="{method}"}} '
+                    f'{data[field]}')
+        for name, kind, description, value in extra:
+            lines.append(f'# HELP foodgram_{name} {description}')
+            lines.append(f'# TYPE foodgram_{name} {kind}')
+            lines.append(f'foodgram_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+class QueryRecorder:
+    """Обёртка выполнения SQL, считающая запросы и их время."""
+
+    def __init__(self, track_duplicates):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter() if track_duplicates else None
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - started
+            self.count += 1
+            if self.statements is not None:
+                self.statements[sql] += 1
+
+    def duplicates(self):
+        if self.statements is None:
+            return {}
+        threshold = settings.REQUEST_METRICS_DUPLICATE_THRESHOLD
+        return {sql: count for sql, count in self.statements.items()
+                if count >= threshold}
+
+
+class RequestMetricsMiddleware:
+    """
+    Замеряет время запроса, представления, сериализации ответа и SQL,
+    отдаёт их в заголовке Server-Timing, пишет строку лога в JSON
+    и накапливает в registry для /api/_metrics.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        recorder = QueryRecorder(settings.REQUEST_METRICS_DUPLICATES)
+        request._metrics_marks = {'start': time.perf_counter()}
+        with connection.execute_wrapper(recorder):
+            response = self.get_response(request)
+        timings = self.timings(request, recorder)
+        response['Server-Timing'] = ', '.join((
+            f'db;dur={timings["db"] * 1000:.1f};'
+            f'desc="{recorder.count} queries"',
+            f'view;dur={timings["view"] * 1000:.1f}',
+            f'serialize;dur={timings["serialize"] * 1000:.1f}',
+            f'total;dur={timings["total"] * 1000:.1f}',
+        ))
+        if response.streaming and not isinstance(response, FileResponse):
+            # Потоковый ответ генерируется уже после выхода из middleware:
+            # его SQL и время учитываются, когда поток дочитан.
+            response.streaming_content = self.stream(
+                response.streaming_content, request, response, recorder)
+        else:
+            self.record(request, response, recorder, timings)
+        return response
+
+    def stream(self, content, request, response, recorder):
+        try:
+            with connection.execute_wrapper(recorder):
+                yield from content
+        finally:
+            self.record(request, response, recorder,
+                        self.timings(request, recorder))
+
+    def timings(self, request, recorder):
+        marks = request._metrics_marks
+        end = time.perf_counter()
+        view_end = marks.get('view_end', end)
+        view_start = marks.get('view_start', view_end)
+        return {
+            'total': end - marks['start'],
+            'view': view_end - view_start,
+            'serialize': end - view_end if 'view_end' in marks else 0.0,
+            'db': recorder.duration,
+            'queries': recorder.count,
+        }
+
+    def record(self, request, response, recorder, timings):
+        duplicates = recorder.duplicates()
+        match = request.resolver_match
+        view = match.view_name if match else 'unresolved'
+        registry.record(view, request.method, response.status_code,
+                        timings, sum(duplicates.values()))
+        logger.info(json.dumps({
+            'method': request.method,
+            'path': request.path,
+            'view': view,
+            'status': response.status_code,
+            'queries': recorder.count,
+            'db_ms': round(timings['db'] * 1000, 2),
+            'view_ms': round(timings['view'] * 1000, 2),
+            'serialize_ms': round(timings['serialize'] * 1000, 2),
+            'total_ms': round(timings['total'] * 1000, 2),
+        }))
+        for sql, count in duplicates.items():
+            logger.warning(json.dumps({
+                'view': view, 'duplicate_query': sql, 'count': count}))
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request._metrics_marks['view_start'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        # Вызывается перед render(): всё, что дальше, - сериализация ответа.
+        request._metrics_marks['view_end'] = time.perf_counter()
+        return response
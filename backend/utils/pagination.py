@@ -0,0 +1,114 @@
+import base64
+from datetime import datetime
+
+from django.conf import settings
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import (BasePagination, CursorPagination,
+                                       LimitOffsetPagination)
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+class RecipeCursorPagination(CursorPagination):
+    """Курсорная пагинация ленты рецептов по (pub_date, id)."""
+    ordering = ('-pub_date', '-id')
+    page_size_query_param = 'limit'
+
+
+class SubscriptionCursorPagination(CursorPagination):
+    """Курсорная пагинация подписок по уникальному username автора."""
+    ordering = ('username',)
+    page_size_query_param = 'limit'
+
+
+class LimitOffsetOrCursorPagination(LimitOffsetPagination):
+    """
+    Пагинация limit/offset, переключаемая на курсорную
+    параметром pagination=cursor или наличием cursor в запросе.
+    """
+    cursor_pagination_class = RecipeCursorPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_paginator = None
+        if (request.query_params.get('pagination') == 'cursor'
+                or 'cursor' in request.query_params):
+            self.cursor_paginator = self.cursor_pagination_class()
+            return self.cursor_paginator.paginate_queryset(
+                queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.cursor_paginator is not None:
+            return self.cursor_paginator.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+
+class SubscriptionPagination(LimitOffsetOrCursorPagination):
+    cursor_pagination_class = SubscriptionCursorPagination
+
+
+class KeysetPagination(BasePagination):
+    """
+    Пагинация по ключу (pub_date, id) для лент, которые собираются
+    из нескольких источников и не являются одним queryset.
+    paginate_queryset принимает функцию timeline(before, limit),
+    возвращающую ключи по убыванию, и отдаёт ключи страницы.
+    """
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    max_page_size = 100
+    invalid_cursor_message = 'Неверный курсор.'
+
+    def paginate_queryset(self, timeline, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        keys = timeline(self.decode_cursor(request), self.page_size + 1)
+        self.next_key = (keys[self.page_size - 1]
+                         if len(keys) > self.page_size else None)
+        return keys[:self.page_size]
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return settings.REST_FRAMEWORK['PAGE_SIZE']
+        return min(max(size, 1), self.max_page_size)
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            pub_date, pk = base64.urlsafe_b64decode(
+                cursor.encode()).decode().rsplit('|', 1)
+            return datetime.fromisoformat(pub_date), int(pk)
+        except (TypeError, ValueError, UnicodeDecodeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def encode_cursor(self, key):
+        cursor = f'{key[0].isoformat()}|{key[1]}'
+        return base64.urlsafe_b64encode(cursor.encode()).decode()
+
+    def get_next_link(self):
+        if self.next_key is None:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param, self.encode_cursor(self.next_key))
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': None,
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'properties': {
+                'next': {'type': 'string', 'nullable': True},
+                'previous': {'type': 'string', 'nullable': True},
+                'results': schema,
+            },
+        }
@@ -0,0 +1,59 @@
+import csv
+import json
+
+from rest_framework.negotiation import DefaultContentNegotiation
+
+EXPORTERS = {}
+DEFAULT_FORMAT = 'txt'
+
+
+class ShoppingListContentNegotiation(DefaultContentNegotiation):
+    """
+    Параметр format выбирает формат файла списка покупок,
+    а не рендерер DRF, поэтому рендерер берётся первый доступный.
+    """
+
+    def select_renderer(self, request, renderers, format_suffix=None):
+        return renderers[0], renderers[0].media_type
+
+
+def register_exporter(fmt, content_type):
+    """Регистрирует генератор строк списка покупок для формата fmt."""
+    def decorator(func):
+        EXPORTERS[fmt] = (func, content_type)
+        return func
+    return decorator
+
+
+class _Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+@register_exporter('txt', 'text/plain; charset=utf-8')
+def export_txt(rows):
+    yield 'Список покупок:\n\n'
+    for row in rows:
+        yield (f"{row['name']} ({row['measurement_unit']}) - "
+               f"{row['total_amount']}\n")
+
+
+@register_exporter('csv', 'text/csv; charset=utf-8')
+def export_csv(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(('name', 'measurement_unit', 'total_amount'))
+    for row in rows:
+        yield writer.writerow(
+            (row['name'], row['measurement_unit'], row['total_amount']))
+
+
+@register_exporter('json', 'application/json')
+def export_json(rows):
+    yield '['
+    separator = ''
+    for row in rows:
+        yield separator + json.dumps(row, ensure_ascii=False)
+        separator = ','
+    yield ']'
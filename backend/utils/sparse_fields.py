@@ -0,0 +1,98 @@
+from rest_framework import serializers
+from rest_framework.permissions import SAFE_METHODS
+
+
+def split(value):
+    return [item.strip() for item in value.split(',') if item.strip()]
+
+
+class SparseFields:
+    """
+    Набор полей ответа из параметров ?fields= и ?expand=.
+    fields - имена полей через запятую, вложенные через точку
+    (author.username). expand - связи, которые отдаются объектами;
+    без expand связь из expandable_fields сериализатора отдаётся id.
+    Без ?fields= выводятся все поля, как раньше.
+    """
+
+    def __init__(self, fields=None, expand=()):
+        self.fields = None if fields is None else list(fields)
+        self.expand = list(expand)
+
+    @classmethod
+    def from_request(cls, request):
+        if request is None or request.method not in SAFE_METHODS:
+            return cls()
+        fields = request.query_params.get('fields')
+        return cls(None if fields is None else split(fields),
+                   split(request.query_params.get('expand', '')))
+
+    @property
+    def is_sparse(self):
+        return self.fields is not None
+
+    def includes(self, name):
+        if self.fields is None:
+            return True
+        return any(path.split('.')[0] == name
+                   for path in self.fields + self.expand)
+
+    def is_expanded(self, name):
+        if self.fields is None:
+            return True
+        return any(path == name or path.startswith(f'{name}.')
+                   for path in self.expand) or any(
+            path.startswith(f'{name}.') for path in self.fields)
+
+    def nested(self, name):
+        """Набор полей вложенного объекта name."""
+        prefix = f'{name}.'
+        expand = [path[len(prefix):] for path in self.expand
+                  if path.startswith(prefix)]
+        if self.fields is None:
+            return SparseFields(None, expand)
+        fields = [path[len(prefix):] for path in self.fields
+                  if path.startswith(prefix)]
+        return SparseFields(fields or None, expand)
+
+    def deferred(self, columns):
+        """
+        Столбцы модели, которые не нужны ни одному запрошенному полю.
+        columns - словарь {столбец: имена полей сериализатора}.
+        """
+        return [column for column, names in columns.items()
+                if not any(self.includes(name) for name in names)]
+
+
+class SparseFieldsMixin:
+    """
+    Оставляет в ответе сериализатора только запрошенные поля.
+    Поля из expandable_fields без expand заменяются на id объекта.
+    """
+    expandable_fields = ()
+
+    def get_sparse_fields(self):
+        sparse = getattr(self, '_sparse_fields', None)
+        if sparse is not None:
+            return sparse
+        parent = self.parent
+        if parent is None or (isinstance(parent, serializers.ListSerializer)
+                              and parent.parent is None):
+            return SparseFields.from_request(self.context.get('request'))
+        return SparseFields()
+
+    def get_fields(self):
+        fields = super().get_fields()
+        sparse = self.get_sparse_fields()
+        for name in list(fields):
+            if not sparse.includes(name):
+                del fields[name]
+            elif name in self.expandable_fields and not sparse.is_expanded(
+                    name):
+                fields[name] = serializers.PrimaryKeyRelatedField(
+                    read_only=True)
+            else:
+                field = getattr(fields[name], 'child', fields[name])
+                if isinstance(field, SparseFieldsMixin):
+                    field._sparse_fields = sparse.nested(name)
+        return fields